@@ -0,0 +1 @@
+"""Benchmarks and synthetic data for the WAF log analyzer"""
@@ -0,0 +1,38 @@
+"""Times the python and pandas Filter backends (tests/test_backend_parity.py checks that they agree)
+
+Usage: python -m benchmarks.bench_backends --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from filter import create_filter
+from benchmarks.synthetic import write_csv
+
+
+def run_backend(backend, file_path):
+    """Runs the full filter pipeline and returns the filter object with the elapsed seconds"""
+    start = time.perf_counter()
+    filter_obj = create_filter(file_path, backend)
+    filter_obj.create_ip_activities()
+    filter_obj.filter_logs()
+    filter_obj.aggregate_by_ip()
+    filter_obj.detect_attack_sequences()
+    return filter_obj, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Filter backends.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the timed synthetic log")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = write_csv(os.path.join(tmp_dir, "large.csv"), args.rows)
+        for backend in ("python", "pandas"):
+            filter_obj, elapsed = run_backend(backend, path)
+            print(f"{backend:>6}: {elapsed:.2f}s ({args.rows / elapsed:,.0f} rows/s, {len(filter_obj.filtered)} filtered logs)")
+
+
+if __name__ == "__main__":
+    main()
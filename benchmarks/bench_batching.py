@@ -0,0 +1,56 @@
+"""Counts the LLM requests of a run with and without batching low-volume attackers, against the mock endpoint
+
+Usage: python -m benchmarks.bench_batching --rows 20000 --ips 2000 --batch_size 10
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.mock_llm import MockLLMServer
+from benchmarks.synthetic import write_csv
+from filter import create_filter
+from summarizer import build_summarizer
+
+
+def run_summaries(file_path, server, **llm_kwargs):
+    """Summarizes every attacker of the log and returns (summaries, requests sent, seconds)"""
+    filter_obj = create_filter(file_path)
+    filter_obj.create_ip_activities()
+    filter_obj.filter_logs()
+    filter_obj.aggregate_by_ip()
+    filter_obj.detect_attack_sequences()
+
+    summarizer = build_summarizer("mock-key", api_url=server.url, **llm_kwargs)
+    requests_before = server.requests
+    start = time.perf_counter()
+    summaries = dict(summarizer.summarize(filter_obj))
+    elapsed = time.perf_counter() - start
+    summarizer.close()
+    return summaries, server.requests - requests_before, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batching of low-volume attackers into one LLM request.")
+    parser.add_argument("--rows", type=int, default=20_000, help="Rows in the synthetic log")
+    parser.add_argument("--ips", type=int, default=2_000, help="Distinct IPs in the synthetic log")
+    parser.add_argument("--batch_size", type=int, default=10, help="Maximum IPs per batched request")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the mock endpoint waits per request")
+    parser.add_argument("--missing_rate", type=float, default=0.02, help="Share of attackers the mock leaves out of batch answers")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = write_csv(os.path.join(tmp_dir, "log.csv"), args.rows, ips=args.ips)
+        with MockLLMServer(latency=args.latency, missing_rate=args.missing_rate) as server:
+            single, single_requests, single_time = run_summaries(path, server)
+            batched, batched_requests, batched_time = run_summaries(path, server, batch_size=args.batch_size)
+
+        assert single.keys() == batched.keys()
+        fallbacks = sum(summary.get("summary_source") == "rule-based" for summary in batched.values())
+        print(f"{len(single)} attackers: {single_requests} requests in {single_time:.2f}s one by one, "
+              f"{batched_requests} requests in {batched_time:.2f}s batched "
+              f"({single_requests / batched_requests:.1f}x fewer, {fallbacks} rule-based fallbacks)")
+
+
+if __name__ == "__main__":
+    main()
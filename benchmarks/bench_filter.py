@@ -0,0 +1,92 @@
+"""Compares the single-pass Filter engine against the previous per-row counting engine
+
+Usage: python -m benchmarks.bench_filter --rows 1000000
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from filter import Filter
+from rule_engine import RuleSet
+from timestamps import parse_timestamp
+from benchmarks.synthetic import write_csv
+
+
+def lifetime_rules():
+    """The bundled rules with lifetime brute-force thresholds, as the previous engine used"""
+    rules = RuleSet.load()
+    for threshold in rules.thresholds:
+        threshold.window_seconds = None
+    return rules
+
+
+class LegacyFilter(Filter):
+    """The previous engine, which recounted the activities of the IP for every row"""
+
+    def create_ip_activities(self):
+        # The previous engine kept every row as a dict and a list of categories per IP
+        with open(self.file_path, 'r', encoding='utf-8') as file:
+            self.rows = list(csv.DictReader(file))
+        for row in self.rows:
+            row["receivedEpoch"] = parse_timestamp(row["receivedTimeFormatted"])
+            self.ip_activities.setdefault(row["externalIp"], []).append(row["violationCategory"])
+
+    def filter_logs(self):
+        low_priority_violations = {"JWT Validation Failed", "Invalid Token", "Session Expired", "Access Control"}
+        sensitive_endpoints = {"/.env", "/config.json", "/.git/config", "/admin/", "/api/keys"}
+
+        for row in self.rows:
+            ip = row["externalIp"]
+            attack_type = row["violationCategory"]
+            attack_list = self.ip_activities[ip]
+            jwt_failures = attack_list.count("JWT Validation Failed")
+            access_control_failures = attack_list.count("Access Control")
+
+            if attack_type == "Access Control":
+                if access_control_failures >= 5:
+                    self.access_control_brute_force_attackers.add(ip)
+                if row["uri"] in sensitive_endpoints:
+                    self.filtered.append(row)
+            if len(set(attack_list)) > 1 and attack_type != "Access Control":
+                self.filtered.append(row)
+            if jwt_failures >= 10:
+                self.jwt_brute_force_attackers.add(ip)
+            if attack_type not in low_priority_violations:
+                self.filtered.append(row)
+
+
+def run_filter(filter_class, file_path):
+    """Runs ingest and filtering and returns the filter object with the elapsed seconds"""
+    filter_obj = filter_class(file_path, lifetime_rules())
+    start = time.perf_counter()
+    filter_obj.create_ip_activities()
+    filter_obj.filter_logs()
+    return filter_obj, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Filter engine on a synthetic log.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the synthetic log")
+    parser.add_argument("--legacy_rows", type=int, default=20_000, help="Rows for the legacy engine, which is quadratic per IP")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Parity and speedup on a log small enough for the legacy engine
+        small_path = write_csv(os.path.join(tmp_dir, "small.csv"), args.legacy_rows)
+        legacy, legacy_time = run_filter(LegacyFilter, small_path)
+        current, current_time = run_filter(Filter, small_path)
+        assert [log.to_dict() for log in current.filtered] == legacy.filtered
+        assert current.jwt_brute_force_attackers == legacy.jwt_brute_force_attackers
+        assert current.access_control_brute_force_attackers == legacy.access_control_brute_force_attackers
+        print(f"{args.legacy_rows} rows: legacy {legacy_time:.2f}s, single-pass {current_time:.2f}s "
+              f"({legacy_time / current_time:.0f}x faster, identical results)")
+
+        large_path = write_csv(os.path.join(tmp_dir, "large.csv"), args.rows)
+        current, current_time = run_filter(Filter, large_path)
+        print(f"{args.rows} rows: single-pass {current_time:.2f}s ({args.rows / current_time:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Compares the peak memory of the compact event store against keeping every row as a dict, through prompt compaction
+
+Usage: python -m benchmarks.bench_memory --rows 1000000
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+import tracemalloc
+
+from filter import Filter
+from log_compactor import LogCompactor
+from timestamps import parse_timestamp
+from benchmarks.synthetic import write_csv
+
+
+class DictRowFilter(Filter):
+    """The previous storage: every row as a dict, with copies referenced by the filtered and aggregated lists"""
+
+    def create_ip_activities(self):
+        with open(self.file_path, 'r', encoding='utf-8') as file:
+            self.rows = list(csv.DictReader(file))
+        ip_activities = {}
+        for row in self.rows:
+            row["receivedEpoch"] = parse_timestamp(row["receivedTimeFormatted"])
+            categories = ip_activities.setdefault(row["externalIp"], {})
+            categories[row["violationCategory"]] = categories.get(row["violationCategory"], 0) + 1
+        self.merge_activities(ip_activities)
+
+    def threshold_epochs(self, attack_type, ips):
+        epochs = {ip: [] for ip in ips}
+        for row in self.rows:
+            if row["violationCategory"] == attack_type and row["externalIp"] in epochs:
+                epochs[row["externalIp"]].append(row["receivedEpoch"])
+        return epochs
+
+    def filter_logs(self):
+        self.flag_thresholds()
+        for row in self.rows:
+            matches = self.matching_rules(row, len(self.ip_activities[row["externalIp"]]))
+            self.filtered.extend([row] * matches)
+
+
+def measure(filter_class, file_path):
+    """Runs the batch pipeline, then compacts the logs of every IP as prompt building does
+
+    Returns (peak traced bytes after filtering, peak traced bytes after compaction, seconds, filtered logs).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    filter_obj = filter_class(file_path)
+    filter_obj.create_ip_activities()
+    filter_obj.filter_logs()
+    filter_obj.aggregate_by_ip()
+    filter_obj.detect_attack_sequences()
+    _, filter_peak = tracemalloc.get_traced_memory()
+
+    compactor = LogCompactor()
+    for logs in filter_obj.aggregated_attackers.values():
+        compactor.compact(logs)  # Reads the wide text fields every prompt needs
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    filter_obj.close()
+    return filter_peak, peak, elapsed, len(filter_obj.filtered)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the memory used by the Filter storage.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the synthetic log")
+    parser.add_argument("--ips", type=int, default=10_000, help="Distinct IPs in the synthetic log")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = write_csv(os.path.join(tmp_dir, "log.csv"), args.rows, ips=args.ips)
+        for name, filter_class in (("dict rows", DictRowFilter), ("event store", Filter)):
+            filter_peak, peak, elapsed, filtered = measure(filter_class, path)
+            print(f"{name:>12}: peak {filter_peak / 2 ** 20:,.0f} MiB after filtering, {peak / 2 ** 20:,.0f} MiB after compaction "
+                  f"({peak / args.rows:,.0f} bytes/row), {elapsed:.2f}s, {filtered} filtered logs")
+
+
+if __name__ == "__main__":
+    main()
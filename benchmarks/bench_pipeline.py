@@ -0,0 +1,93 @@
+"""Runs json_runner end to end against the mock LLM endpoint and reports throughput, memory and total time
+
+Usage: python -m benchmarks.bench_pipeline --sizes 10000 1000000 10000000 --data_dir bench_data
+
+Every size runs in its own process, so the peak memory (max RSS) of one run does not hide the next.
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_llm import MockLLMServer
+from benchmarks.synthetic import write_csv
+from json_runner import json_runner
+from profiler import Profiler
+
+
+def log_path(data_dir, rows, ips, skew, sequence_share):
+    """Returns the synthetic log for these parameters, writing it only if it doesn't exist yet"""
+    path = os.path.join(data_dir, f"waf_{rows}_{ips}_{skew}_{sequence_share}.csv")
+    if not os.path.exists(path):
+        write_csv(path, rows, ips=ips, skew=skew, sequence_share=sequence_share)
+    return path
+
+
+def run_once(args):
+    """Runs one size in this process and prints its measurements as one JSON line"""
+    path = log_path(args.data_dir, args.run_rows, args.ips, args.skew, args.sequence_share)
+    profiler = Profiler()
+    with MockLLMServer(latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed) as server:
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            json_runner("mock-key", path, backend=args.backend, workers=args.workers, profiler=profiler, api_url=server.url,
+                        concurrency=args.concurrency, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+
+    report = profiler.report()
+    stages = report["stages"]
+    print(json.dumps({
+        "rows": args.run_rows,
+        "seconds": elapsed,
+        "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,  # kB on Linux
+        "ingest_rows_per_second": stages["read_logs"]["per_second"],
+        "filter_rows_per_second": stages["filter_logs"]["per_second"],
+        "analysis_seconds": sum(stages[name]["wall_seconds"] for name in ("read_logs", "filter_logs", "aggregate_by_ip", "detect_attack_sequences")),
+        "summarize_seconds": stages["summarize"]["wall_seconds"],
+        "ips": stages["summarize"]["items"],
+        "llm_requests": report["counters"].get("llm_requests", 0),
+        "llm_latency_p95": report["histograms"].get("llm_latency_seconds", {}).get("p95"),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark json_runner end to end on synthetic logs and a mock LLM.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000], help="Row counts to run")
+    parser.add_argument("--ips", type=int, default=5_000, help="Distinct IPs in the synthetic logs")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of the IP distribution")
+    parser.add_argument("--sequence_share", type=float, default=0.01, help="Share of rows in multi-step attack sequences")
+    parser.add_argument("--data_dir", help="Keep the generated logs here and reuse them (default: a temporary directory)")
+    parser.add_argument("--backend", choices=["python", "pandas"], default="python", help="Filter backend")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to read the logs")
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM requests in flight")
+    parser.add_argument("--batch_size", type=int, default=1, help="Low-volume IPs per LLM request")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the mock endpoint waits per request")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Share of mock requests answered with HTTP 500")
+    parser.add_argument("--rate_limit_rate", type=float, default=0.0, help="Share of mock requests answered with HTTP 429")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the mock failure draws")
+    parser.add_argument("--run_rows", type=int, help=argparse.SUPPRESS)  # Set for the per-size child processes
+    args = parser.parse_args()
+
+    if args.run_rows:
+        run_once(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir or tmp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"{'rows':>12} {'total s':>9} {'analysis s':>11} {'ingest rows/s':>14} {'filter rows/s':>14} {'IPs':>7} {'LLM s':>8} {'requests':>9} {'max RSS MiB':>12}")
+        for rows in args.sizes:
+            command = [sys.executable, "-m", "benchmarks.bench_pipeline", *sys.argv[1:], "--data_dir", data_dir, "--run_rows", str(rows)]
+            result = json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+            print(f"{rows:>12,} {result['seconds']:>9.2f} {result['analysis_seconds']:>11.2f} {result['ingest_rows_per_second']:>14,.0f} "
+                  f"{result['filter_rows_per_second']:>14,.0f} {result['ips']:>7} {result['summarize_seconds']:>8.2f} "
+                  f"{result['llm_requests']:>9} {result['max_rss_mib']:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Times the queries the dashboard runs to open a result store with many attackers
+
+Usage: python -m benchmarks.bench_result_store --ips 50000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import ip_address
+from result_store import ResultStore
+from rollups import RESOLUTIONS, compute_rollups
+
+CATEGORIES = ["Injections", "Cross Site Scripting", "Path Traversal", "Access Control"]
+START_EPOCH = 1735689600
+
+
+def synthetic_attackers(ips, events_per_ip=10, days=7):
+    """Returns {IP: filtered logs} with the events of every IP spread over days"""
+    span = days * 86400
+    return {
+        ip_address(number): [{"receivedEpoch": START_EPOCH + (number * 7919 + event * 104729) % span,
+                              "violationCategory": CATEGORIES[(number + event) % len(CATEGORIES)]}
+                             for event in range(events_per_ip)]
+        for number in range(ips)
+    }
+
+
+def fill_store(path, ips):
+    """Stores one finished run with ips synthetic summaries and returns its id"""
+    store = ResultStore(path)
+    run_id = store.start_run("benchmark")
+    store.set_attackers(run_id, ips, compute_rollups(synthetic_attackers(ips)))
+    for number in range(ips):
+        summary = {
+            "attacker_ip": ip_address(number),
+            "attack_summary": "Repeated SQL Injection attempts against the login endpoint, followed by XSS probes.",
+            "attack_types": ["SQL Injection", "Reflected XSS"],
+            "suggested_mitigation": "Use parameterized queries and encode output.",
+        }
+        store.put_summary(run_id, summary["attacker_ip"], summary, 10)
+    store.finish_run(run_id)
+    store.close()
+    return run_id
+
+
+def open_dashboard(path):
+    """Runs the queries of a first dashboard load without any cache and returns the seconds they took"""
+    start = time.perf_counter()
+    store = ResultStore(path)
+    run = store.latest_run("benchmark")
+    matching = store.count_summaries(run["id"])
+    store.page(run["id"], "", 0, 50)
+    first, last, _ = store.rollup_span(run["id"])
+    store.rollup(run["id"], RESOLUTIONS["10m"], first, last)
+    store.close()
+    return time.perf_counter() - start, matching
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark opening the dashboard on a large result store.")
+    parser.add_argument("--ips", type=int, default=50_000, help="Attackers in the stored run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "results.sqlite")
+        start = time.perf_counter()
+        run_id = fill_store(path, args.ips)
+        print(f"Stored {args.ips} summaries in {time.perf_counter() - start:.2f}s")
+
+        elapsed, matching = open_dashboard(path)
+        print(f"First page of {matching} attackers: {elapsed * 1000:.1f} ms")
+
+        store = ResultStore(path)
+        for label, query in (("Last page", lambda: store.page(run_id, "", (args.ips // 50) * 50, 50)),
+                             ("IP search", lambda: (store.count_summaries(run_id, "10.0.1"), store.page(run_id, "10.0.1", 0, 50))),
+                             ("Full summary", lambda: store.summary(run_id, "10.0.0.7")),
+                             ("Chart, 1m over one day", lambda: store.rollup(run_id, RESOLUTIONS["1m"], START_EPOCH, START_EPOCH + 86400)),
+                             ("Chart, 1h per category", lambda: store.rollup(run_id, RESOLUTIONS["1h"], categories=CATEGORIES[:2])),
+                             ("Chart, 10m of 5 IPs", lambda: store.rollup(run_id, RESOLUTIONS["10m"], ips=[ip_address(n) for n in range(5)]))):
+            start = time.perf_counter()
+            query()
+            print(f"{label}: {(time.perf_counter() - start) * 1000:.1f} ms")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Compares the cached timestamp parser against per-row strptime
+
+Usage: python -m benchmarks.bench_timestamps --rows 1000000
+"""
+import argparse
+import time
+
+from datetime import datetime, timezone
+
+from timestamps import parse_timestamp
+from benchmarks.synthetic import generate_rows
+
+
+def strptime_epoch(value):
+    """Parses a timestamp the way the dashboard used to, once per row"""
+    return int(datetime.strptime(value, "%d/%m/%Y %H:%M").replace(tzinfo=timezone.utc).timestamp())
+
+
+def time_parser(parser, values):
+    """Returns the seconds needed to parse all values"""
+    start = time.perf_counter()
+    for value in values:
+        parser(value)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark timestamp parsing.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Timestamps to parse")
+    args = parser.parse_args()
+
+    values = [row["receivedTimeFormatted"] for row in generate_rows(args.rows)]
+    assert all(parse_timestamp(value) == strptime_epoch(value) for value in values[:10000])
+    parse_timestamp.cache_clear()
+
+    strptime_time = time_parser(strptime_epoch, values)
+    cached_time = time_parser(parse_timestamp, values)
+    uncached_time = time_parser(parse_timestamp.__wrapped__, values)
+
+    print(f"{args.rows} timestamps ({len(set(values))} distinct):")
+    print(f"  strptime per row:  {strptime_time:.2f}s")
+    print(f"  fast path, no cache: {uncached_time:.2f}s ({strptime_time / uncached_time:.1f}x faster)")
+    print(f"  fast path, cached:   {cached_time:.2f}s ({strptime_time / cached_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
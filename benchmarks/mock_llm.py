@@ -0,0 +1,135 @@
+"""A local stand-in for the Groq chat completions endpoint
+
+Usage: python -m benchmarks.mock_llm --port 8000 --latency 0.5 --rate_limit_rate 0.1
+then run proj.py with --api_url http://127.0.0.1:8000/v1/chat/completions
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ATTACKER_IP_PATTERN = re.compile(r'"attacker_ip": (\S+) - this parameter is the IP')
+BATCH_ATTACKER_PATTERN = re.compile(r'#### \*\*Attacker (\S+)\*\*')  # Attacker headings of a batch prompt
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        """Answers a chat completion request with a well-formed attack summary"""
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = request["messages"][-1]["content"]
+        with self.server.lock:
+            self.server.requests += 1
+        time.sleep(self.server.latency)
+
+        outcome = self.server.next_outcome()
+        if outcome == "rate_limited":
+            self.send_json(429, {"error": {"message": "Rate limit reached"}}, {"Retry-After": str(self.server.retry_after)})
+            return
+        if outcome == "error":
+            self.send_json(500, {"error": {"message": "Internal server error"}})
+            return
+
+        batch_ips = BATCH_ATTACKER_PATTERN.findall(prompt)
+        if batch_ips:
+            # Batch prompts get an array, with some entries left out to exercise the per-IP retries
+            answer = [self.summary(ip) for ip in batch_ips if not self.server.drops_entry()]
+        else:
+            match = ATTACKER_IP_PATTERN.search(prompt)
+            answer = self.summary(match.group(1) if match else "unknown")
+        content = "Here is the summary you asked for" if outcome == "malformed" else json.dumps(answer)
+        self.send_json(200, {
+            "choices": [{"message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 60, "total_tokens": len(prompt) // 4 + 60},
+        })
+
+    @staticmethod
+    def summary(attacker_ip):
+        """Returns a well-formed attack summary for one IP"""
+        return {
+            "attacker_ip": attacker_ip,
+            "attack_summary": "Mock summary of the attacker's activity.",
+            "attack_types": ["Mock Attack"],
+            "suggested_mitigation": "Mock mitigation.",
+        }
+
+    def send_json(self, status, body, headers=None):
+        """Writes a JSON response"""
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        """Keeps the benchmark output quiet"""
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    def __init__(self, port=0, latency=0.0, error_rate=0.0, rate_limit_rate=0.0, malformed_rate=0.0, retry_after=1, seed=0, missing_rate=0.0):
+        """Initialize the server on 127.0.0.1 (port 0 picks a free port) with its latency and failure rates"""
+        super().__init__(("127.0.0.1", port), MockLLMHandler)
+        self.latency = latency  # Seconds to wait before answering
+        self.error_rate = error_rate  # Share of requests answered with HTTP 500
+        self.rate_limit_rate = rate_limit_rate  # Share of requests answered with HTTP 429
+        self.malformed_rate = malformed_rate  # Share of requests answered with content that is not JSON
+        self.retry_after = retry_after  # Retry-After seconds sent with every 429
+        self.missing_rate = missing_rate  # Share of attackers left out of batch answers
+        self.requests = 0  # Number of requests received
+        self.rng = random.Random(seed)  # Failures are reproducible for a given seed
+        self.lock = threading.Lock()
+
+    def next_outcome(self):
+        """Draws the outcome of the next request: ok, error, rate_limited or malformed"""
+        with self.lock:
+            draw = self.rng.random()
+        for outcome, rate in (("error", self.error_rate), ("rate_limited", self.rate_limit_rate), ("malformed", self.malformed_rate)):
+            if draw < rate:
+                return outcome
+            draw -= rate
+        return "ok"
+
+    def drops_entry(self):
+        """Draws whether the next attacker of a batch answer is left out"""
+        with self.lock:
+            return self.rng.random() < self.missing_rate
+
+    @property
+    def url(self):
+        """The chat completions URL to pass to LLMProcessor"""
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/chat/completions"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock Groq chat completions server.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to wait before each response")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="Share of requests answered with HTTP 500")
+    parser.add_argument("--rate_limit_rate", type=float, default=0.0, help="Share of requests answered with HTTP 429")
+    parser.add_argument("--malformed_rate", type=float, default=0.0, help="Share of requests answered with non-JSON content")
+    parser.add_argument("--retry_after", type=int, default=1, help="Retry-After seconds sent with every 429")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the failure draws")
+    parser.add_argument("--missing_rate", type=float, default=0.0, help="Share of attackers left out of batch answers")
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.port, args.latency, args.error_rate, args.rate_limit_rate, args.malformed_rate, args.retry_after, args.seed, args.missing_rate)
+    print(f"Mock LLM listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
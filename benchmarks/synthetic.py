@@ -0,0 +1,109 @@
+import argparse
+import csv
+import random
+
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate, count
+
+from rule_engine import RuleSet
+
+# Columns of a WAF export, in the order the real exports use
+FIELDNAMES = ["externalIp", "violationCategory", "violationType", "uri", "description", "receivedTimeFormatted"]
+
+# Violation categories with the violation types they usually carry
+CATEGORIES = {
+    "Path Traversal": ["Directory Traversal", "Predictable Resource Location"],
+    "Information Leakage": ["Server Information Leakage", "Error Page Leakage"],
+    "Injections": ["SQL Injection", "Command Injection"],
+    "Cross Site Scripting": ["Reflected XSS", "Stored XSS"],
+    "JWT Validation Failed": ["JWT Signature Invalid", "JWT Expired"],
+    "Authentication & Authorization": ["Login Failure", "Credential Stuffing"],
+    "Access Control": ["URL Access Violation", "Forbidden Method"],
+    "Invalid Token": ["Malformed Token"],
+    "Session Expired": ["Session Timeout"],
+}
+
+URIS = ["/", "/login", "/search", "/api/v1/users", "/api/keys", "/admin/", "/.env", "/config.json", "/.git/config", "/static/app.js"]
+
+
+def ip_address(number):
+    """Returns the synthetic IP with the given 1-based number"""
+    return f"10.{number // 65536 % 256}.{number // 256 % 256}.{number % 256}"
+
+
+def generate_rows(rows, ips=1000, noisy_ip_share=0.2, seed=0, start=datetime(2025, 1, 1), skew=0.0, sequence_share=0.0, seconds_per_row=2):
+    """Yields deterministic synthetic WAF log rows
+
+    A share of all rows (noisy_ip_share) comes from a single scanner IP, the rest is spread over the other IPs:
+    uniformly, or Zipf-like with weight 1 / rank ** skew when skew > 0. A share of the rows (sequence_share) walks
+    IPs through the stages of the bundled attack sequences, one IP after the other.
+    """
+    rng = random.Random(seed)
+    categories = list(CATEGORIES)
+    ip_pool = [ip_address(i) for i in range(1, ips + 1)]
+    noisy_ip = ip_pool[0]
+    cumulative_weights = list(accumulate(1 / rank ** skew for rank in range(1, ips + 1))) if skew > 0 else None
+    sequence_stages = [[sorted(stage) for stage in sequence.stages] for sequence in RuleSet.load().sequences] if sequence_share > 0 else None
+    sequence_ips = count(ips + 1)  # Sequence attackers get IPs outside the pool, so their history is only the sequence
+    active_sequence = None  # [ip, remaining stages] of the sequence being emitted
+    formatted_minute, formatted = None, None  # Timestamps only change once per minute, so format each minute once
+
+    for i in range(rows):
+        if sequence_stages and rng.random() < sequence_share:
+            if not active_sequence:
+                active_sequence = [ip_address(next(sequence_ips)), list(rng.choice(sequence_stages))]
+            ip = active_sequence[0]
+            category = rng.choice(active_sequence[1].pop(0))
+            if not active_sequence[1]:
+                active_sequence = None
+        else:
+            if rng.random() < noisy_ip_share:
+                ip = noisy_ip
+            elif cumulative_weights:
+                ip = ip_pool[bisect(cumulative_weights, rng.random() * cumulative_weights[-1])]
+            else:
+                ip = rng.choice(ip_pool)
+            category = rng.choice(categories)
+        violation_type = rng.choice(CATEGORIES[category])
+        uri = rng.choice(URIS)
+
+        minute = i * seconds_per_row // 60
+        if minute != formatted_minute:
+            formatted_minute, formatted = minute, (start + timedelta(minutes=minute)).strftime("%d/%m/%Y %H:%M")
+
+        yield {
+            "externalIp": ip,
+            "violationCategory": category,
+            "violationType": violation_type,
+            "uri": uri,
+            "description": f"{violation_type} detected on {uri}",
+            "receivedTimeFormatted": formatted,
+        }
+
+
+def write_csv(path, rows, **kwargs):
+    """Writes a synthetic WAF log CSV to path and returns the path"""
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(generate_rows(rows, **kwargs))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic WAF log CSV.")
+    parser.add_argument("path", help="CSV file to write")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the log")
+    parser.add_argument("--ips", type=int, default=1000, help="Distinct IPs (IP cardinality)")
+    parser.add_argument("--noisy_ip_share", type=float, default=0.2, help="Share of rows from a single scanner IP")
+    parser.add_argument("--skew", type=float, default=0.0, help="Zipf exponent of the IP distribution, 0 for uniform")
+    parser.add_argument("--sequence_share", type=float, default=0.0, help="Share of rows that belong to multi-step attack sequences")
+    parser.add_argument("--seed", type=int, default=0, help="Seed, the same arguments always give the same file")
+    args = parser.parse_args()
+
+    write_csv(args.path, args.rows, ips=args.ips, noisy_ip_share=args.noisy_ip_share, skew=args.skew, sequence_share=args.sequence_share, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import csv
+import threading
+
+from array import array
+from collections import OrderedDict
+
+from timestamps import parse_timestamp
+
+
+class StringTable:
+    """Interns strings to small integer ids"""
+    __slots__ = ("ids", "values")
+
+    def __init__(self):
+        self.ids = {}  # String -> id
+        self.values = []  # Id -> string
+
+    def intern(self, value):
+        """Returns the id of a string, adding it when new"""
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return string_id
+
+
+class EventRecord:
+    """A read-only, dict-like view of one stored event
+
+    The narrow fields used by the rules come from the store's arrays; the wide text fields (description,
+    receivedTimeFormatted and any other column) are read back from the log file whenever they are needed. Records
+    don't keep the loaded row, so memory stays flat while prompts are built. Records compare by identity, like
+    the rows they replace; use to_dict() to compare values.
+    """
+    __slots__ = ("store", "index")
+
+    NARROW_FIELDS = ("externalIp", "violationCategory", "violationType", "uri", "receivedEpoch")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        store, index = self.store, self.index
+        if key == "externalIp":
+            return store.ips.values[store.ip_ids[index]]
+        if key == "violationCategory":
+            return store.categories.values[store.category_ids[index]]
+        if key == "violationType":
+            return store.violation_types.values[store.violation_type_ids[index]]
+        if key == "uri":
+            return store.uris.values[store.uri_ids[index]]
+        if key == "receivedEpoch":
+            return store.epochs[index]
+        return store.load_row(index)[key]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        """Returns the full event as a plain dict"""
+        return {**self.store.load_row(self.index), **{key: self[key] for key in self.NARROW_FIELDS}}
+
+    def __repr__(self):
+        return f"EventRecord({self.to_dict()!r})"
+
+
+class EventStore:
+    """Stores every log row once, as interned ids and integers in parallel arrays
+
+    Rows are referenced by index. The file offset of each row is kept so wide text fields can be loaded on demand.
+    """
+
+    def __init__(self, row_cache_size=4096):
+        self.ips = StringTable()
+        self.categories = StringTable()
+        self.violation_types = StringTable()
+        self.uris = StringTable()
+        self.sources = []  # (file path, CSV header) of every file rows were read from
+
+        self.ip_ids = array('I')
+        self.category_ids = array('I')
+        self.violation_type_ids = array('I')
+        self.uri_ids = array('I')
+        self.epochs = array('q')  # receivedTimeFormatted as epoch seconds
+        self.source_ids = array('H')  # Index into self.sources
+        self.offsets = array('q')  # Byte offset of the row in its source file
+        self.skipped_rows = 0  # Rows left out because their receivedTimeFormatted could not be parsed
+
+        self._handles = {}  # Open source files for lazy loading
+        self._lock = threading.Lock()  # Prompts are built by several threads
+        self.row_cache_size = row_cache_size  # Recently loaded rows kept, a prompt reads several fields of each row
+        self._row_cache = OrderedDict()  # Index -> loaded row, least recently used first
+
+    def __len__(self):
+        return len(self.epochs)
+
+    def __getstate__(self):
+        """Stores are sent between processes without their open files"""
+        state = self.__dict__.copy()
+        state["_handles"] = {}
+        state["_row_cache"] = OrderedDict()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def read_csv(self, path, start=0, end=None):
+        """Appends the rows of a CSV file, or only those whose first byte is inside the range [start, end)
+
+        Rows with an unparsable timestamp are skipped and counted in skipped_rows.
+        """
+        with open(path, 'rb') as file:
+            header = next(csv.reader([file.readline().decode('utf-8')]))
+            source_id = len(self.sources)
+            self.sources.append((path, header))
+            columns = {name: position for position, name in enumerate(header)}
+            ip_column, category_column = columns["externalIp"], columns["violationCategory"]
+            type_column, uri_column, time_column = columns["violationType"], columns.get("uri"), columns["receivedTimeFormatted"]
+
+            if start > 0:
+                file.seek(start - 1)
+                file.readline()  # Move to the first line that starts inside the range
+                if file.tell() < start:
+                    file.seek(start)
+
+            line_starts = []  # Offsets of the lines the CSV reader consumed for the current row
+
+            def lines():
+                while end is None or file.tell() < end or line_starts:
+                    offset = file.tell()
+                    line = file.readline()
+                    if not line:
+                        return
+                    line_starts.append(offset)
+                    yield line.decode('utf-8')
+
+            for values in csv.reader(lines()):
+                offset = line_starts[0]
+                line_starts.clear()
+                if not values:
+                    continue  # Blank line
+                try:
+                    epoch = parse_timestamp(values[time_column])
+                except ValueError:
+                    self.skipped_rows += 1
+                    continue
+                self.append(values[ip_column], values[category_column], values[type_column],
+                            values[uri_column] if uri_column is not None else "N/A", epoch, source_id, offset)
+
+    def append(self, ip, attack_type, violation_type, uri, epoch, source_id, offset):
+        """Stores one event"""
+        self.ip_ids.append(self.ips.intern(ip))
+        self.category_ids.append(self.categories.intern(attack_type))
+        self.violation_type_ids.append(self.violation_types.intern(violation_type))
+        self.uri_ids.append(self.uris.intern(uri))
+        self.epochs.append(epoch)
+        self.source_ids.append(source_id)
+        self.offsets.append(offset)
+
+    def extend(self, other):
+        """Appends all events of another store, remapping its ids (used to merge shards)"""
+        for table_name, ids_name in (("ips", "ip_ids"), ("categories", "category_ids"),
+                                     ("violation_types", "violation_type_ids"), ("uris", "uri_ids")):
+            table = getattr(self, table_name)
+            mapping = [table.intern(value) for value in getattr(other, table_name).values]
+            getattr(self, ids_name).extend(mapping[string_id] for string_id in getattr(other, ids_name))
+
+        source_mapping = []
+        for source in other.sources:
+            if source not in self.sources:
+                self.sources.append(source)
+            source_mapping.append(self.sources.index(source))
+        self.source_ids.extend(source_mapping[source_id] for source_id in other.source_ids)
+        self.epochs.extend(other.epochs)
+        self.offsets.extend(other.offsets)
+        self.skipped_rows += other.skipped_rows
+
+    def category_counts(self, first=0):
+        """Returns {ip: {category: count}} for the events from index first on"""
+        pair_counts = {}
+        for pair in zip(self.ip_ids[first:], self.category_ids[first:]):
+            pair_counts[pair] = pair_counts.get(pair, 0) + 1
+
+        counts = {}
+        for (ip_id, category_id), count in pair_counts.items():
+            counts.setdefault(self.ips.values[ip_id], {})[self.categories.values[category_id]] = count
+        return counts
+
+    def record(self, index):
+        """Returns a dict-like view of one event"""
+        return EventRecord(self, index)
+
+    def load_row(self, index):
+        """Reads the full CSV row of an event back from its source file, or from the cache of recently loaded rows"""
+        path, header = self.sources[self.source_ids[index]]
+        with self._lock:
+            row = self._row_cache.get(index)
+            if row is not None:
+                self._row_cache.move_to_end(index)
+                return row
+            handle = self._handles.get(path)
+            if handle is None:
+                handle = self._handles[path] = open(path, 'rb')
+            handle.seek(self.offsets[index])
+            # The reader pulls more lines only when a quoted field spans several of them
+            values = next(csv.reader(line.decode('utf-8') for line in iter(handle.readline, b"")))
+            row = self._row_cache[index] = dict(zip(header, values))
+            if len(self._row_cache) > self.row_cache_size:
+                self._row_cache.popitem(last=False)
+        return row
+
+    def close(self):
+        """Closes the source files opened for lazy loading"""
+        with self._lock:
+            for handle in self._handles.values():
+                handle.close()
+            self._handles.clear()
+            self._row_cache.clear()
@@ -1,68 +1,112 @@
-import csv
+import sys
+
+from collections import Counter
+
+from event_store import EventStore
+from rule_engine import RuleSet, SlidingWindowCounter
+from timestamps import format_timestamp
 
 
 class Filter:
-    def __init__(self, file_path):
-        """Initialize the filter with log file path and prepare data structures"""
+    def __init__(self, file_path, rules=None):
+        """Initialize the filter with log file path and rule set (rules.json by default) and prepare data structures"""
         self.file_path = file_path
-        self.ip_activities = {}  # Dictionary with IPs as keys and a list of their activities
+        self.rules = rules or RuleSet.load()  # Keep rules, thresholds and attack sequences
+        self.events = EventStore()  # All log rows, read once from the CSV file and stored compactly
+        self.ip_activities = {}  # Dictionary with IPs as keys and a Counter of their attack categories
         self.filtered = []  # List of logs that passed filtering
-        self.jwt_brute_force_attackers = set()  # Set of IPs with excessive JWT failures
-        self.access_control_brute_force_attackers = set()  # Set of IPs with excessive Access Control violations
+        self.threshold_attackers = {threshold.name: set() for threshold in self.rules.thresholds}  # Flagged IPs per threshold
+        self.jwt_brute_force_attackers = self.threshold_attackers.setdefault("jwt_brute_force", set())  # Set of IPs with excessive JWT failures
+        self.access_control_brute_force_attackers = self.threshold_attackers.setdefault("access_control_brute_force", set())  # Set of IPs with excessive Access Control violations
+        self.threshold_peaks = {name: {} for name in self.threshold_attackers}  # Windowed thresholds: IP -> (peak count, window start, window end)
         self.aggregated_attackers = {}  # Dictionary with filtered logs grouped by IP
         self.multi_step_attacks = {}  # Store detected attack sequences
+        self.skipped_rows = 0  # Log rows left out because their receivedTimeFormatted could not be parsed
 
     def create_ip_activities(self):
-        """Creates a dictionary of activities per IP"""
-        with open(self.file_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)  # Read CSV as a dictionary
-
-            for row in reader:
-                ip = row["externalIp"]
-                attack_type = row["violationCategory"]
-
-                # Track attack history for the IP
-                if ip not in self.ip_activities:
-                    self.ip_activities[ip] = []
-                self.ip_activities[ip].append(attack_type)
+        """Reads the log file once and counts the attack categories of every IP"""
+        self.events.read_csv(self.file_path)  # Timestamps are parsed once, to epoch seconds
+        self.merge_activities(self.events.category_counts())
+        self.skipped_rows = self.events.skipped_rows
+        self.report_skipped_rows()
+
+    def report_skipped_rows(self):
+        """Warns on stderr about log rows that were left out because of an unparsable timestamp"""
+        if self.skipped_rows:
+            print(f"Skipped {self.skipped_rows} log rows with an empty or unsupported receivedTimeFormatted", file=sys.stderr)
+
+    def merge_activities(self, ip_activities):
+        """Adds {ip: {category: count}} to the attack history of the IPs"""
+        for ip, categories in ip_activities.items():
+            if ip not in self.ip_activities:
+                self.ip_activities[ip] = Counter()
+            self.ip_activities[ip].update(categories)
+
+    def matching_rules(self, row, distinct_categories):
+        """Returns how many keep rules match the row, each matching rule keeps one copy of it"""
+        return self.rules.matching_rules(row["violationCategory"], row["uri"], distinct_categories)
+
+    def flag_thresholds(self):
+        """Flags the IPs that reach a threshold, inside its sliding time window when it has one"""
+        for threshold in self.rules.thresholds:
+            ips = self.threshold_candidates(threshold)
+            if threshold.window_seconds is None:
+                self.threshold_attackers[threshold.name].update(ips)
+            elif ips:
+                # The total count only bounds the windows, so replay the events of these IPs
+                for ip, epochs in self.threshold_epochs(threshold.category, ips).items():
+                    self.record_peak(threshold, ip, sorted(epochs))
+
+    def threshold_candidates(self, threshold):
+        """Returns the IPs whose total count of the threshold's category reaches it"""
+        # Thresholds only depend on the counters, so check them once per IP instead of once per row
+        return {ip for ip, categories in self.ip_activities.items() if categories[threshold.category] >= threshold.min_count}
+
+    def threshold_epochs(self, attack_type, ips):
+        """Returns the event times of one category for the given IPs"""
+        store = self.events
+        category_id = store.categories.ids.get(attack_type)
+        epochs = {store.ips.ids[ip]: [] for ip in ips}
+        for ip_id, row_category_id, epoch in zip(store.ip_ids, store.category_ids, store.epochs):
+            if row_category_id == category_id and ip_id in epochs:
+                epochs[ip_id].append(epoch)
+        return {store.ips.values[ip_id]: ip_epochs for ip_id, ip_epochs in epochs.items()}
+
+    def record_peak(self, threshold, ip, epochs):
+        """Runs a sliding window over the time-sorted events of an IP and flags it if the peak reaches the threshold"""
+        counter = SlidingWindowCounter(threshold.window_seconds)
+        for epoch in epochs:
+            counter.add(epoch)
+        if counter.peak >= threshold.min_count:
+            self.threshold_attackers[threshold.name].add(ip)
+            self.threshold_peaks[threshold.name][ip] = (counter.peak, counter.peak_start, counter.peak_end)
+
+    def threshold_status(self, ip, name):
+        """Describes whether the IP reached a threshold, with its peak window for the LLM, or returns False"""
+        if ip not in self.threshold_attackers.get(name, ()):
+            return False
+        peak = self.threshold_peaks.get(name, {}).get(ip)
+        if peak is None:
+            return True
+        count, start, end = peak
+        return f"True (peak of {count} events between {format_timestamp(start)} and {format_timestamp(end)})"
 
     def filter_logs(self):
         """Applies filtering rules to logs"""
-        low_priority_violations = {"JWT Validation Failed", "Invalid Token", "Session Expired", "Access Control"}
-        sensitive_endpoints = {"/.env", "/config.json", "/.git/config", "/admin/", "/api/keys"}  # Sensitive paths
-        jwt_threshold = 10  # Flag brute-force attackers if JWT failures ≥ 10
-        access_control_threshold = 5  # Flag brute-force attackers if access control violations ≥ 5
-
-        with open(self.file_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-
-            for row in reader:
-                ip = row["externalIp"]
-                attack_type = row["violationCategory"]
-                request_uri = row["uri"]
-
-                attack_list = self.ip_activities[ip]
-                jwt_failures = attack_list.count("JWT Validation Failed")
-                access_control_failures = attack_list.count("Access Control")
-
-                # Keep log if:
-                if attack_type == "Access Control":
-                    if access_control_failures >= access_control_threshold:
-                        # Excessive Access Control violations from the same IP (Possible brute-force attack)
-                        self.access_control_brute_force_attackers.add(ip)
-                    if request_uri in sensitive_endpoints:
-                        # Access Control violations on sensitive endpoints
-                        self.filtered.append(row)
-
-                if len(set(self.ip_activities[ip])) > 1 and attack_type != "Access Control":
-                    # IP has multiple different attack types
-                    self.filtered.append(row)
-                if jwt_failures >= jwt_threshold:
-                    # Excessive JWT failures from the same IP (Possible brute-force attack)
-                    self.jwt_brute_force_attackers.add(ip)  # Track JWT brute-force attackers
-                if attack_type not in low_priority_violations:
-                    # Attack is NOT in low-priority list, so we keep it
-                    self.filtered.append(row)
+        self.flag_thresholds()
+
+        store = self.events
+        distinct_categories = [len(self.ip_activities[ip]) for ip in store.ips.values]  # Indexed by IP id
+        categories, uris = store.categories.values, store.uris.values
+        matches_cache = {}  # The rules only see (category, URI, distinct categories), so evaluate each combination once
+
+        for index, (category_id, uri_id, ip_id) in enumerate(zip(store.category_ids, store.uri_ids, store.ip_ids)):
+            key = (category_id, uri_id, distinct_categories[ip_id])
+            matches = matches_cache.get(key)
+            if matches is None:
+                matches = matches_cache[key] = self.rules.matching_rules(categories[category_id], uris[uri_id], key[2])
+            if matches:
+                self.filtered.extend([store.record(index)] * matches)  # One record, referenced by every matching rule
 
     def aggregate_by_ip(self):
         """Groups all filtered logs by IP"""
@@ -75,54 +119,44 @@ class Filter:
 
     def detect_attack_sequences(self):
         """Detects multistep attack sequences"""
-
-        # attack categories
-        RECON_ATTACKS = {"Path Traversal", "Information Leakage"}
-        EXPLOIT_ATTACKS = {"Injections", "Cross Site Scripting"}
-        BRUTE_FORCE_ATTACKS = {"JWT Validation Failed", "Authentication & Authorization"}
-        ACCOUNT_TAKEOVER = {"Access Control"}
-
         for ip, logs in self.aggregated_attackers.items():
-            logs.sort(key=lambda x: x["receivedTimeFormatted"])  # Sort logs per IP by timestamp
-
-            found_recon = False
-            found_exploit = False
-            found_brute_force = False
-            found_account_takeover = False
-            recon_time = None
-            brute_force_time = None
-
-            # Iterate over logs to detect sequences
-            for log in logs:
-                attack_type = log["violationCategory"]
-                timestamp = log["receivedTimeFormatted"]
-
-                # Detect Reconnaissance - Exploitation
-                if attack_type in RECON_ATTACKS:
-                    found_recon = True
-                    recon_time = timestamp  # Store the first reconnaissance timestamp
-
-                if attack_type in EXPLOIT_ATTACKS and found_recon:
-                    # Ensure exploitation happens AFTER reconnaissance
-                    if recon_time and timestamp > recon_time:
-                        self.multi_step_attacks[ip] = "Reconnaissance - Exploitation"
-
-                # Detect Brute-Force - Account Takeover
-                if attack_type in BRUTE_FORCE_ATTACKS:
-                    found_brute_force = True
-                    brute_force_time = timestamp  # Store brute-force attempt time
-
-                if attack_type in ACCOUNT_TAKEOVER and found_brute_force:
-                    # Ensure account takeover happens AFTER brute-force
-                    if brute_force_time and timestamp > brute_force_time:
-                        self.multi_step_attacks[ip] = "Brute-Force - Account Takeover"
-
-                # Detect Brute-Force - Exploitation
-                if attack_type in EXPLOIT_ATTACKS and found_brute_force:
-                    if brute_force_time and timestamp > brute_force_time:
-                        self.multi_step_attacks[ip] = "Brute-Force - Exploitation"
-
-                # Detect Reconnaissance - Brute-Force
-                if attack_type in BRUTE_FORCE_ATTACKS and found_recon:
-                    if recon_time and timestamp > recon_time:
-                        self.multi_step_attacks[ip] = "Reconnaissance - Brute-Force"
+            sequence = self.detect_sequence(logs)
+            if sequence:
+                self.multi_step_attacks[ip] = sequence
+
+    def detect_sequence(self, logs):
+        """Returns the multistep attack sequence detected in the logs of one IP, or None"""
+        logs.sort(key=lambda x: x["receivedEpoch"])  # Sort logs per IP by timestamp
+
+        # Feed the events to the compiled sequence state machine, the last completed sequence is reported
+        state = self.rules.new_sequence_state()
+        sequence = None
+        for log in logs:
+            completed = self.rules.step(state, log["violationCategory"], log["receivedEpoch"])
+            if completed:
+                sequence = completed
+
+        return sequence
+
+    def close(self):
+        """Closes the log files the event store opened to load wide fields lazily"""
+        self.events.close()
+
+
+def create_filter(file_path, backend="python", workers=1, rules_path=None):
+    """Creates the Filter for the chosen backend: 'python' (row by row) or 'pandas' (vectorized)
+
+    file_path may also be a list of files; several files or workers > 1 use a process pool to ingest them.
+    rules_path selects a rule file instead of the bundled rules.json.
+    """
+    file_paths = [file_path] if isinstance(file_path, str) else list(file_path)
+    rules = RuleSet.load(rules_path)
+    if backend == "pandas":
+        if workers > 1 or len(file_paths) > 1:
+            raise ValueError("The pandas backend reads a single file in one process")
+        from pandas_filter import PandasFilter  # pandas is only imported when this backend is chosen
+        return PandasFilter(file_paths[0], rules)
+    if workers > 1 or len(file_paths) > 1:
+        from sharded_filter import ShardedFilter
+        return ShardedFilter(file_paths, workers, rules)
+    return Filter(file_paths[0], rules)
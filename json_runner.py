@@ -1,44 +1,88 @@
 import json
+import sys
 
-from filter import Filter  # Import the Filter class
-from llm_processor import LLMProcessor  # Import the LLMProcessor class
+from filter import create_filter
+from jsonl_writer import JSONLWriter
+from profiler import Profiler
+from summarizer import build_summarizer
 
 
-def json_runner(api_key, file_path):
+def json_runner(api_key, file_path, ordered=False, backend="python", workers=1, rules_path=None, profiler=None,
+                jsonl_path=None, compression=None, resume=False, **llm_kwargs):
+    """Analyzes the logs and prints one JSON summary per attacker, or writes JSON Lines to jsonl_path ('-' for stdout)
+
+    With resume, attackers already in the JSONL output of an interrupted run are skipped.
+    """
     # Initialize classes
-    filter_obj = Filter(file_path)
-    llm = LLMProcessor(api_key)
+    profiler = profiler or Profiler()  # Stage timings, read by --profile
+    filter_obj = create_filter(file_path, backend, workers, rules_path)
+    summarizer = build_summarizer(api_key, profiler=profiler, **llm_kwargs)
+    writer = JSONLWriter(jsonl_path, compression, resume) if jsonl_path else None  # Opened first, so output errors show up before the analysis
 
     # Run the filtering and aggregation process
-    filter_obj.create_ip_activities()
-    filter_obj.filter_logs()
-    filter_obj.aggregate_by_ip()
-    filter_obj.detect_attack_sequences()
-
-    # Generate attack summaries using LLM
-    for ip, logs in filter_obj.aggregated_attackers.items():
-        detected_sequence_status = filter_obj.multi_step_attacks.get(ip, "None")  # Retrieves the detected multistep attack sequence for the IP
-        jwt_brute_force_status = ip in filter_obj.jwt_brute_force_attackers
-        access_control_brute_force_status = ip in filter_obj.access_control_brute_force_attackers
-
-        success = False  # Make sure we got a response for the IP
-
-        # Make sure we don't skip attackers if we didn't get a response
-        while not success:
-            # Send logs and additional info to LLM
-            attack_summary_json = llm.attack_summary(
-                ip,
-                logs,
-                detected_sequence_status,
-                jwt_brute_force_status,
-                access_control_brute_force_status
-            )
-
-            if attack_summary_json:
-                # Ensure attack_types is formatted as a single-line list
-                attack_summary_json["attack_types"] = "[" + ", ".join(attack_summary_json.get("attack_types", [])) + "]"
-
-                print(json.dumps(attack_summary_json, indent=0))
-                success = True
-            else:
-                print(f"\nNo valid response for attacker: {ip}")
+    with profiler.stage("read_logs", "rows") as stage:
+        filter_obj.create_ip_activities()
+        stage.items = count_rows(filter_obj)
+    with profiler.stage("filter_logs", "rows") as stage:
+        filter_obj.filter_logs()
+        stage.items = count_rows(filter_obj)
+    with profiler.stage("aggregate_by_ip", "IPs") as stage:
+        filter_obj.aggregate_by_ip()
+        stage.items = len(filter_obj.aggregated_attackers)
+    with profiler.stage("detect_attack_sequences", "IPs") as stage:
+        filter_obj.detect_attack_sequences()
+        stage.items = len(filter_obj.aggregated_attackers)
+
+    ips = list(filter_obj.aggregated_attackers)
+    if writer and writer.written_ips:
+        ips = [ip for ip in ips if ip not in writer.written_ips]  # Already summarized by the interrupted run
+        print(f"Resuming: {len(filter_obj.aggregated_attackers) - len(ips)} attackers already in {jsonl_path}", file=sys.stderr)
+
+    # Generate attack summaries using LLM, printed as they complete (or in input order)
+    with profiler.stage("summarize", "IPs") as stage:
+        try:
+            for ip, attack_summary_json in summarizer.summarize(filter_obj, ips, ordered=ordered):
+                if writer:
+                    writer.write({**attack_summary_json, "attacker_ip": ip})  # The checkpoint relies on the real IP
+                else:
+                    print_attack_summary(attack_summary_json)
+                stage.items += 1
+        finally:
+            filter_obj.close()
+            if writer:
+                writer.close()  # Whatever was summarized before an error stays in the output for the next resume
+
+    report_token_savings(summarizer.llm.token_savings)
+    report_cache_stats(summarizer.close())
+
+
+def count_rows(filter_obj):
+    """Returns the number of log rows a Filter read, whatever its backend"""
+    return sum(sum(categories.values()) for categories in filter_obj.ip_activities.values())
+
+
+def print_attack_summary(attack_summary_json):
+    """Prints an attack summary as JSON"""
+    # Ensure attack_types is formatted as a single-line list
+    attack_summary_json["attack_types"] = "[" + ", ".join(attack_summary_json.get("attack_types", [])) + "]"
+
+    print(json.dumps(attack_summary_json, indent=0))
+
+
+def report_cache_stats(stats):
+    """Prints the summary cache counters to stderr, keeping stdout pure JSON"""
+    if stats:
+        print(f"Summary cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions", file=sys.stderr)
+
+
+def report_token_savings(token_savings, top=5):
+    """Prints to stderr how many prompt tokens log compaction saved, in total and for the IPs that saved the most"""
+    if not token_savings:
+        return
+    original = sum(tokens[0] for tokens in token_savings.values())
+    compacted = sum(tokens[1] for tokens in token_savings.values())
+    print(f"Log compaction: {original} -> {compacted} prompt tokens ({original - compacted} saved) over {len(token_savings)} IPs", file=sys.stderr)
+
+    ranked = sorted(token_savings.items(), key=lambda item: item[1][1] - item[1][0])[:top]
+    for ip, (ip_original, ip_compacted) in ranked:
+        print(f"  {ip}: {ip_original} -> {ip_compacted} tokens ({ip_original - ip_compacted} saved)", file=sys.stderr)
@@ -0,0 +1,129 @@
+import gzip
+import io
+import json
+import os
+import queue
+import sys
+import threading
+
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}  # Compression picked from the output file name
+
+
+def import_zstandard():
+    """Imports the optional zstandard package, only needed for zstd output"""
+    try:
+        import zstandard
+    except ImportError as error:
+        raise ImportError("zstd output needs the zstandard package: pip install zstandard") from error
+    return zstandard
+
+
+class JSONLWriter:
+    def __init__(self, path="-", compression=None, resume=False, queue_size=10000):
+        """Initialize a writer of one JSON record per line to a file ('-' for stdout), optionally gzip/zstd compressed
+
+        With resume, the records of an earlier run in the same file are kept and their IPs reported in written_ips.
+        """
+        self.path = path
+        self.compression = compression or COMPRESSION_SUFFIXES.get(os.path.splitext(path)[1])  # None, 'gzip' or 'zstd'
+        self.written_ips = set()  # IPs whose records an earlier run already wrote
+        if resume and path != "-" and os.path.exists(path):
+            self.written_ips = self.recover()
+        self.file = self.open_file(path, "ab" if resume else "wb")
+        self.records = 0  # Records written by this run
+        self.error = None  # First write error of the background thread, raised to the caller
+        self.queue = queue.Queue(queue_size)  # Bounded, so a stalled output slows the producers down instead of growing forever
+        self.thread = threading.Thread(target=self.run, name="jsonl-writer", daemon=True)
+        self.thread.start()
+
+    def open_file(self, path, mode):
+        """Opens a file, or stdout for '-', for binary writing, compressed like the output"""
+        if path == "-":
+            if self.compression == "gzip":
+                return gzip.GzipFile(fileobj=sys.stdout.buffer, mode="wb")  # Closing it ends the gzip stream, not stdout
+            if self.compression == "zstd":
+                return import_zstandard().ZstdCompressor().stream_writer(sys.stdout.buffer, closefd=False)
+            return sys.stdout.buffer
+        if self.compression == "gzip":
+            return gzip.open(path, mode)
+        if self.compression == "zstd":
+            return import_zstandard().ZstdCompressor().stream_writer(open(path, mode))  # Appending starts a new frame
+        return open(path, mode)
+
+    def open_reader(self):
+        """Opens the existing output for reading lines"""
+        if self.compression == "gzip":
+            return gzip.open(self.path, "rb")
+        if self.compression == "zstd":
+            reader = import_zstandard().ZstdDecompressor().stream_reader(open(self.path, "rb"), read_across_frames=True)
+            return io.BufferedReader(reader)
+        return open(self.path, "rb")
+
+    def recover(self):
+        """Returns the IPs of the complete records already in the output
+
+        A run killed mid-write can leave a partial line or a truncated compressed stream behind; the file is then
+        rewritten with its complete records only, so appending to it gives a valid file again.
+        """
+        read_errors = (EOFError, OSError) + ((import_zstandard().ZstdError,) if self.compression == "zstd" else ())
+        lines, written_ips, damaged = [], set(), False
+        try:
+            with self.open_reader() as file:
+                for line in file:
+                    try:
+                        written_ips.add(json.loads(line)["attacker_ip"])
+                    except (ValueError, KeyError, TypeError):
+                        damaged = True  # Partial or corrupt line
+                        continue
+                    if not line.endswith(b"\n"):
+                        damaged = True
+                        line += b"\n"
+                    lines.append(line)
+        except read_errors:
+            damaged = True  # Truncated compressed stream, the lines before the damage were kept
+
+        if damaged:
+            rewritten_path = f"{self.path}.tmp"
+            with self.open_file(rewritten_path, "wb") as file:
+                file.write(b"".join(lines))
+            os.replace(rewritten_path, self.path)  # The damaged file is only replaced once the rewrite is complete
+        return written_ips
+
+    def write(self, record):
+        """Queues one record; it is written and flushed by the background thread"""
+        if self.error:
+            raise self.error
+        self.queue.put(record)
+
+    def run(self):
+        """Writes queued records, flushing whenever the queue runs empty so results reach the reader as they complete"""
+        while True:
+            record = self.queue.get()
+            if record is None:
+                break
+            if self.error:
+                continue  # Keep draining so producers never block on a dead writer
+            try:
+                self.file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                self.records += 1
+                if self.queue.empty():
+                    self.file.flush()  # gzip and zstd flush a complete block, readable even if the run dies later
+            except (OSError, ValueError) as error:
+                self.error = error
+
+    def close(self):
+        """Writes the remaining records and closes the output (stdout is only flushed)"""
+        self.queue.put(None)
+        self.thread.join()
+        if self.file is not sys.stdout.buffer:
+            self.file.close()  # Also ends a compressed stream on stdout
+        if self.path == "-":
+            sys.stdout.buffer.flush()
+        if self.error:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
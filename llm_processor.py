@@ -1,38 +1,18 @@
 import json
-import requests
-
+import sys
+import threading
+import time
 
-class LLMProcessor:
-    def __init__(self, api_key):
-        """Initialize LLMProcessor with Groq API key"""
-        self.api_key = api_key  # Authenticate requests to Groq API
-        self.api_url = "https://api.groq.com/openai/v1/chat/completions"  # Endpoint URL where requests are sent
-        self.model = "llama-3.1-8b-instant"  # The LLM model groq should use for text generation
+import requests
 
-    def attack_summary(self, attacker_ip, attacker_logs, detected_sequence_status, jwt_brute_force_status, access_control_brute_force_status):
-        """Send data to LLM and handle the response"""
+from log_compactor import LogCompactor, estimate_tokens
+from profiler import Profiler
+from retry import CircuitBreaker, LLMAuthError, LLMResponseError, RetryPolicy, parse_retry_after
 
-        # Format logs for LLM
-        processed_logs = [
-            f"Description:{log['description']}, Received time:{log['receivedTimeFormatted']}, Violation Type:{log['violationType']} Target URI: {log.get('uri', 'N/A')}"
-            for log in attacker_logs
-        ]
+PROMPT_VERSION = 3  # Bump whenever the prompt template changes, so cached summaries are not reused
 
-        # Prompt for LLM
-        prompt = f"""
-        You are a cybersecurity expert analyzing security logs from a Web Application Firewall (WAF). 
-        Your task is to **identify attack patterns, assess severity correctly, and suggest practical mitigations**.
-
-        ### **Response Format**
-        Return the response **ONLY** as structured JSON:
-        {{
-            "attacker_ip": {attacker_ip} - this parameter is the IP! don't use whats in the log!,
-            "attack_summary": "<Brief attack description, including attack patterns and intent>",
-            "attack_types": ["<Attack Type 1>", "<Attack Type 2>"] - Take the value of Violation Type!,
-            "suggested_mitigation": "<Specific, actionable security recommendations>"
-        }}
-
-        ### **Important Rules**
+# Analysis rules shared by the single and the batch prompt, indented as they appear inside the prompts
+ANALYSIS_RULES = """### **Important Rules**
         1) **Responses MUST be in JSON format and only in JSON format!!**
             - You MUST return ONLY JSON formats.
             - NEVER start your answer with the term 'json'.
@@ -58,18 +38,59 @@ class LLMProcessor:
         
         6) **VERY IMPORTANT!** If you detect **multiple waves of attacks per IP** (e.g., one group of events in a short time span, and another group in a different time),
            **consider it in your answer** and analyze the different attack waves separately.
+           The detected attack waves are listed before the events; identical events are collapsed with their count and first/last time.
 
         7) **Detect attack escalation (VERY IMPORTANT!!!)**  
            - If an attacker **progresses from simple to advanced techniques** over time, mention it in the attack summary.  
            - Example: If an attacker **starts with login brute-force and later moves to SQL Injection**, describe it as **an escalation in attack methods**.  
-           - If no escalation is detected, do not mention it.
+           - If no escalation is detected, do not mention it."""
+
+
+class LLMProcessor:
+    def __init__(self, api_key, api_url=None, retry_policy=None, circuit_breaker=None, cache=None, compactor=None, profiler=None):
+        """Initialize LLMProcessor with Groq API key, an optional endpoint override, the retry settings, a SummaryCache, a LogCompactor and a Profiler"""
+        self.api_key = api_key  # Authenticate requests to Groq API
+        self.api_url = api_url or "https://api.groq.com/openai/v1/chat/completions"  # Endpoint URL where requests are sent
+        self.model = "llama-3.1-8b-instant"  # The LLM model groq should use for text generation
+        self.retry_policy = retry_policy or RetryPolicy()  # How often and how long to retry a failed summary
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()  # Shared by all workers using this processor
+        self.cache = cache  # Optional SummaryCache, consulted before any request is sent
+        self.compactor = compactor or LogCompactor()  # Shrinks the logs of an IP to the prompt token budget
+        self.profiler = profiler or Profiler()  # Timings, latencies, token usage and retry counts of the requests
+        self.token_savings = {}  # Dictionary with IPs as keys and (original tokens, compacted tokens) of their logs
+        self._local = threading.local()  # One HTTP session per worker thread, so connections are reused
+
+    estimate_tokens = staticmethod(estimate_tokens)  # Roughly estimates the tokens of a prompt
+
+    def build_prompt(self, attacker_ip, attacker_logs, detected_sequence_status, jwt_brute_force_status, access_control_brute_force_status):
+        """Builds the attack summary prompt for the logs of one attacker"""
+
+        # Deduplicate, collapse and budget the logs for LLM
+        processed_logs, original_tokens, compacted_tokens = self.compactor.compact(attacker_logs)
+        self.token_savings[attacker_ip] = (original_tokens, compacted_tokens)
+
+        # Prompt for LLM
+        prompt = f"""
+        You are a cybersecurity expert analyzing security logs from a Web Application Firewall (WAF). 
+        Your task is to **identify attack patterns, assess severity correctly, and suggest practical mitigations**.
+
+        ### **Response Format**
+        Return the response **ONLY** as structured JSON:
+        {{
+            "attacker_ip": {attacker_ip} - this parameter is the IP! don't use whats in the log!,
+            "attack_summary": "<Brief attack description, including attack patterns and intent>",
+            "attack_types": ["<Attack Type 1>", "<Attack Type 2>"] - Take the value of Violation Type!,
+            "suggested_mitigation": "<Specific, actionable security recommendations>"
+        }}
+
+        {ANALYSIS_RULES}
 
         ### **Security Logs to Analyze**
-        {json.dumps(processed_logs, indent=2)}
+        {processed_logs}
 
         ### **Detected Multi-Step Attack Sequence**: {detected_sequence_status}
         ### **Detected JWT Brute-Force Attack**: {jwt_brute_force_status}
-        ### **Detected JWT Brute-Force Attack**: {access_control_brute_force_status}
+        ### **Detected Access Control Brute-Force Attack**: {access_control_brute_force_status}
         
         IMPORTANT: **Always include the attacker IP exactly as provided in the response.**
         
@@ -81,7 +102,162 @@ class LLMProcessor:
             "suggested_mitigation": "Enforce input validation, use parameterized queries, and sanitize inputs to mitigate SQL Injection and XSS vulnerabilities."
         }}
         """
+        return prompt
+
+    def build_batch_prompt(self, attackers, sections=None):
+        """Builds one prompt asking for a JSON array of summaries, for a dict of attacker IP -> (logs, sequence, JWT status, Access Control status)
+
+        sections may hold attacker sections that were already built, e.g. while planning the batches.
+        """
+        sections = sections or {}
+        sections = "\n".join(sections.get(attacker_ip) or self.attacker_section(attacker_ip, *details) for attacker_ip, details in attackers.items())
+
+        # Prompt for LLM, the rules and example are sent once for all attackers
+        prompt = f"""
+        You are a cybersecurity expert analyzing security logs from a Web Application Firewall (WAF). 
+        Your task is to **identify attack patterns, assess severity correctly, and suggest practical mitigations** for each of the {len(attackers)} attackers below.
+
+        ### **Response Format**
+        Return the response **ONLY** as a structured JSON array with exactly one object per attacker:
+        [
+            {{
+                "attacker_ip": "<The IP from the attacker heading, exactly as written>",
+                "attack_summary": "<Brief attack description, including attack patterns and intent>",
+                "attack_types": ["<Attack Type 1>", "<Attack Type 2>"] - Take the value of Violation Type!,
+                "suggested_mitigation": "<Specific, actionable security recommendations>"
+            }}
+        ]
+
+        {ANALYSIS_RULES}
+
+        8) **Analyze every attacker separately**, using only the logs and detections listed under its own heading.
+
+        ### **Attackers to Analyze**
+        {sections}
+
+        IMPORTANT: **Return one object for every attacker IP above, with the IP exactly as provided.**
+
+        EXAMPLE OF A GOOD OUTPUT:
+        [{{"attacker_ip": "192.168.1.100", "attack_summary": "Over a 24-hour period, this attacker targeted login and search endpoints with multiple SQL Injection attempts to bypass authentication.", "attack_types": ["SQL Injection"], "suggested_mitigation": "Enforce input validation and use parameterized queries."}}, {{"attacker_ip": "192.168.1.101", "attack_summary": "A short burst of requests probing for exposed configuration files.", "attack_types": ["Predictable Resource Location"], "suggested_mitigation": "Remove sensitive files from public paths and block IPs probing for them."}}]
+        """
+        return prompt
+
+    def attacker_section(self, attacker_ip, attacker_logs, detected_sequence_status, jwt_brute_force_status, access_control_brute_force_status):
+        """Builds the part of the batch prompt describing one attacker"""
+        processed_logs, original_tokens, compacted_tokens = self.compactor.compact(attacker_logs)
+        self.token_savings[attacker_ip] = (original_tokens, compacted_tokens)
+        return f"""
+        #### **Attacker {attacker_ip}**
+        {processed_logs}
+        Detected Multi-Step Attack Sequence: {detected_sequence_status}
+        Detected JWT Brute-Force Attack: {jwt_brute_force_status}
+        Detected Access Control Brute-Force Attack: {access_control_brute_force_status}
+        """
 
+    def cache_key(self, attacker_ip, attacker_logs, detected_sequence_status, jwt_brute_force_status, access_control_brute_force_status):
+        """Returns the summary cache key of an attacker, or None without a cache"""
+        if not self.cache:
+            return None
+        return self.cache.make_key(self.model, PROMPT_VERSION, attacker_ip, attacker_logs, detected_sequence_status, jwt_brute_force_status, access_control_brute_force_status)
+
+    def attack_summary_with_retry(self, attacker_ip, attacker_logs, detected_sequence_status, jwt_brute_force_status, access_control_brute_force_status, rate_limiter=None):
+        """Summarizes one attacker with retries, falling back to a rule-based summary when the LLM keeps failing"""
+        cache_key = self.cache_key(attacker_ip, attacker_logs, detected_sequence_status, jwt_brute_force_status, access_control_brute_force_status)
+        if cache_key:
+            cached_summary = self.cache.get(cache_key)
+            if cached_summary is not None:
+                return cached_summary
+
+        with self.profiler.stage("build_prompt"):
+            prompt = self.build_prompt(attacker_ip, attacker_logs, detected_sequence_status, jwt_brute_force_status, access_control_brute_force_status)
+        attack_summary_json = self.request_with_retry(prompt, f"attacker {attacker_ip}", rate_limiter)
+        if attack_summary_json is not None:
+            if cache_key:
+                self.cache.put(cache_key, attack_summary_json)  # Rule-based fallbacks are never cached
+            return attack_summary_json
+
+        print(f"No valid response for attacker: {attacker_ip}, using rule-based summary", file=sys.stderr)
+        self.profiler.count("llm_fallbacks")
+        return rule_based_summary(attacker_ip, attacker_logs, detected_sequence_status, jwt_brute_force_status, access_control_brute_force_status)
+
+    def attack_summaries_with_retry(self, attackers, rate_limiter=None, sections=None):
+        """Summarizes several attackers with one request and returns {ip: summary}
+
+        attackers maps each IP to (logs, sequence, JWT status, Access Control status). IPs whose entry is missing
+        or malformed in the answer, or all of them when the batch request keeps failing, are summarized one by one.
+        sections optionally holds the already built prompt section of some attackers.
+        """
+        summaries = {}
+        pending = {}  # Attackers that are not cached yet
+        for attacker_ip, details in attackers.items():
+            cache_key = self.cache_key(attacker_ip, *details)
+            cached_summary = self.cache.get(cache_key) if cache_key else None
+            if cached_summary is not None:
+                summaries[attacker_ip] = cached_summary
+            else:
+                pending[attacker_ip] = (details, cache_key)
+
+        if len(pending) > 1:
+            with self.profiler.stage("build_prompt"):
+                prompt = self.build_batch_prompt({attacker_ip: details for attacker_ip, (details, _) in pending.items()}, sections)
+            answer = self.request_with_retry(prompt, f"batch of {len(pending)} attackers", rate_limiter, list)
+            batch_summaries = split_batch_answer(answer, pending)
+            self.profiler.count("llm_batch_entries_retried", len(pending) - len(batch_summaries))
+            for attacker_ip, summary in batch_summaries.items():
+                cache_key = pending.pop(attacker_ip)[1]
+                if cache_key:
+                    self.cache.put(cache_key, summary)
+                summaries[attacker_ip] = summary
+
+        for attacker_ip, (details, _) in pending.items():
+            summaries[attacker_ip] = self.attack_summary_with_retry(attacker_ip, *details, rate_limiter)
+        return summaries
+
+    def request_with_retry(self, prompt, description, rate_limiter=None, expected_type=dict):
+        """Sends a prompt with retries and returns the parsed answer, or None when the LLM keeps failing
+
+        Raises LLMAuthError when the API rejects the key, since no other request can succeed either.
+        """
+        tokens = self.estimate_tokens(prompt)
+        malformed = 0
+
+        for attempt in range(self.retry_policy.max_attempts):
+            if attempt:
+                self.profiler.count("llm_retries")
+            self.circuit_breaker.wait()  # All workers pause while the API is failing
+            if rate_limiter:
+                rate_limiter.acquire(tokens)
+
+            try:
+                answer = self.request_completion(prompt, expected_type)
+                self.circuit_breaker.record(True)
+                return answer
+            except LLMResponseError as error:
+                if error.malformed:
+                    # The API itself is healthy, the model just answered badly - ask again right away
+                    self.profiler.count("llm_malformed_answers")
+                    self.circuit_breaker.record(True)
+                    malformed += 1
+                    if malformed >= self.retry_policy.max_malformed_attempts:
+                        break
+                    continue
+
+                if isinstance(error, LLMAuthError):
+                    raise
+                if not error.retryable:
+                    # A bad request fails the same way every time, it says nothing about the API's health
+                    print(f"API Error for {description}: {error}", file=sys.stderr)
+                    break
+                self.circuit_breaker.record(False)
+                if attempt + 1 < self.retry_policy.max_attempts:
+                    time.sleep(self.retry_policy.delay(attempt, error.retry_after))  # No wait before the fallback
+        return None
+
+    def request_completion(self, prompt, expected_type=dict):
+        """Sends a prompt to the LLM and returns the parsed JSON response, raising LLMResponseError on failure
+
+        expected_type is dict for a single summary and list for a batch; any other answer counts as malformed.
+        """
         # Prepare API request
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -97,14 +273,118 @@ class LLMProcessor:
             "temperature": 0.5,  # Controls how random or deterministic the AI’s response is
         }
 
-        response = requests.post(self.api_url, headers=headers, json=payload, timeout=30)  # Sends an HTTP POST request to the Groq API to get an LLM-generated response
+        self.profiler.count("llm_requests")
+        start = time.perf_counter()
+        try:
+            with self.profiler.stage("llm_network_wait"):
+                response = self._session().post(self.api_url, headers=headers, json=payload, timeout=30)  # Sends an HTTP POST request to the Groq API to get an LLM-generated response
+        except requests.RequestException as error:
+            self.profiler.count("llm_request_errors")
+            raise LLMResponseError(f"Request failed: {error}") from error
+        self.profiler.observe("llm_latency_seconds", time.perf_counter() - start)
 
         # Parse response
-        if response.status_code == 200:
-            response_json = response.json()  # Converts the response to a python dictionary
-            llm_content = response_json["choices"][0]["message"]["content"].strip()  # Extracts the actual text response from the API
-            structured_response = json.loads(llm_content)
-            return structured_response  # Return structured JSON directly
-        else:
-            print(f"API Error: {response.status_code}")
-            return None
+        if response.status_code != 200:
+            self.profiler.count("llm_rate_limited" if response.status_code == 429 else "llm_http_errors")
+            if response.status_code in (401, 403):
+                raise LLMAuthError(f"HTTP {response.status_code}, the API key was rejected")
+            retryable = response.status_code == 429 or response.status_code >= 500  # Rate limits and server errors are temporary
+            raise LLMResponseError(f"HTTP {response.status_code}", retryable, parse_retry_after(response.headers.get("Retry-After")))
+
+        with self.profiler.stage("parse_response"):
+            try:
+                response_json = response.json()  # Converts the response to a python dictionary
+                llm_content = response_json["choices"][0]["message"]["content"].strip()  # Extracts the actual text response from the API
+            except (ValueError, KeyError, IndexError, TypeError) as error:
+                raise LLMResponseError(f"Unexpected response body: {error}") from error
+            self.profiler.add_usage(response_json.get("usage"))  # Tokens actually billed, as reported by the API
+
+            structured_response = parse_llm_json(llm_content)
+        if expected_type is list and isinstance(structured_response, dict):
+            # Models sometimes wrap the array in an object, e.g. {"summaries": [...]}
+            arrays = [value for value in structured_response.values() if isinstance(value, list)]
+            structured_response = arrays[0] if len(arrays) == 1 else structured_response
+        if not isinstance(structured_response, expected_type):
+            raise LLMResponseError(f"LLM answer is not a JSON {'array' if expected_type is list else 'object'}", malformed=True)
+        return structured_response  # Return structured JSON directly
+
+    def _session(self):
+        """Returns the HTTP session of the current thread"""
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+
+def parse_llm_json(llm_content):
+    """Parses the JSON answer of the LLM, tolerating code fences and text around the object or array, or returns None"""
+    try:
+        return json.loads(llm_content)
+    except json.JSONDecodeError:
+        pass
+
+    # Models sometimes wrap the answer in ```json fences or add a sentence around it
+    starts = [position for position in (llm_content.find("{"), llm_content.find("[")) if position != -1]
+    if not starts:
+        return None
+    start = min(starts)
+    end = llm_content.rfind("}" if llm_content[start] == "{" else "]")
+    if end <= start:
+        return None
+    try:
+        return json.loads(llm_content[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+
+
+SUMMARY_FIELDS = ("attack_summary", "attack_types", "suggested_mitigation")  # Fields every summary must have
+
+
+def split_batch_answer(answer, attacker_ips):
+    """Returns {ip: summary} for the well-formed entries of a batch answer that belong to the requested IPs"""
+    summaries = {}
+    for entry in answer or []:
+        if not isinstance(entry, dict) or any(field not in entry for field in SUMMARY_FIELDS):
+            continue
+        attacker_ip = str(entry.get("attacker_ip", "")).strip()
+        if attacker_ip in attacker_ips and attacker_ip not in summaries:
+            summaries[attacker_ip] = {**entry, "attacker_ip": attacker_ip}
+    return summaries
+
+
+# Mitigations used by the rule-based summary, keyed by words found in the violation categories and types
+RULE_BASED_MITIGATIONS = {
+    "injection": "Use parameterized queries and strict input validation.",
+    "script": "Encode output and enforce a Content Security Policy.",
+    "traversal": "Normalize and validate file paths, and block access outside the web root.",
+    "leakage": "Disable verbose errors and remove sensitive files from public paths.",
+    "jwt": "Rate limit token validation failures and rotate signing keys.",
+    "authentication": "Enforce rate limiting, MFA and CAPTCHA on login endpoints.",
+    "access control": "Review authorization rules and block IPs probing restricted resources.",
+}
+
+
+def rule_based_summary(attacker_ip, attacker_logs, detected_sequence_status, jwt_brute_force_status, access_control_brute_force_status):
+    """Builds an attack summary from the detection results alone, used when the LLM gives no valid answer"""
+    attack_types = sorted({log["violationType"] for log in attacker_logs})
+    categories = sorted({log["violationCategory"] for log in attacker_logs})
+
+    findings = [f"{len(attacker_logs)} filtered events in the categories: {', '.join(categories)}."]
+    if detected_sequence_status and detected_sequence_status != "None":
+        findings.append(f"Multi-step attack sequence detected: {detected_sequence_status}.")
+    if jwt_brute_force_status:
+        findings.append("JWT brute-force activity detected.")
+    if access_control_brute_force_status:
+        findings.append("Access Control brute-force activity detected.")
+
+    searched = " ".join(categories + attack_types).lower()
+    mitigations = [mitigation for keyword, mitigation in RULE_BASED_MITIGATIONS.items() if keyword in searched]
+    if not mitigations:
+        mitigations.append("Apply general best security practices: logging, monitoring and access controls.")
+
+    return {
+        "attacker_ip": attacker_ip,
+        "attack_summary": " ".join(findings),
+        "attack_types": attack_types,
+        "suggested_mitigation": " ".join(mitigations),
+        "summary_source": "rule-based",  # Marks summaries that did not come from the LLM
+    }
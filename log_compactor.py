@@ -0,0 +1,86 @@
+import json
+
+from timestamps import format_timestamp
+
+
+def estimate_tokens(text):
+    """Roughly estimates the tokens of a text (about 4 characters per token)"""
+    return len(text) // 4 + 1
+
+
+class LogCompactor:
+    def __init__(self, token_budget=3000, wave_gap_seconds=1800, max_waves=10):
+        """Initialize the compactor with the token budget for the logs section of one prompt"""
+        self.token_budget = token_budget  # Maximum estimated tokens of the compacted logs
+        self.wave_gap_seconds = wave_gap_seconds  # A pause longer than this starts a new attack wave
+        self.max_waves = max_waves  # Waves beyond this are merged into the last listed wave
+
+    def compact(self, attacker_logs):
+        """Compacts the logs of one IP into prompt text and returns (text, original tokens, compacted tokens)"""
+        # Rules may keep the same row several times, the LLM only needs it once
+        unique_logs = list({id(log): log for log in attacker_logs}.values())
+        timed_logs = sorted(((log["receivedEpoch"], log) for log in unique_logs), key=lambda item: item[0])
+
+        wave_lines = [self.format_wave(number, wave) for number, wave in enumerate(self.split_waves(timed_logs), 1)]
+        event_lines, omitted_groups, omitted_events = self.group_events(timed_logs, self.token_budget - estimate_tokens("\n".join(wave_lines)))
+
+        lines = ["Attack waves:"] + wave_lines + ["Events (identical events collapsed):"] + event_lines
+        if omitted_groups:
+            lines.append(f"... {omitted_groups} less frequent event groups ({omitted_events} events) omitted to fit the token budget")
+        text = "\n".join(lines)
+
+        # What the prompt used to contain: every kept row, duplicates included
+        original_logs = [
+            f"Description:{log['description']}, Received time:{log['receivedTimeFormatted']}, Violation Type:{log['violationType']} Target URI: {log.get('uri', 'N/A')}"
+            for log in attacker_logs
+        ]
+        return text, estimate_tokens(json.dumps(original_logs, indent=2)), estimate_tokens(text)
+
+    def split_waves(self, timed_logs):
+        """Splits time-sorted (epoch, log) pairs into waves separated by pauses longer than wave_gap_seconds"""
+        waves = []
+        for timestamp, log in timed_logs:
+            if not waves or (timestamp - waves[-1][-1][0] > self.wave_gap_seconds and len(waves) < self.max_waves):
+                waves.append([])
+            waves[-1].append((timestamp, log))
+        return waves
+
+    @staticmethod
+    def format_wave(number, wave):
+        """Describes one wave by its time span, size and most common violation types"""
+        type_counts = {}
+        for _, log in wave:
+            type_counts[log["violationType"]] = type_counts.get(log["violationType"], 0) + 1
+        top_types = sorted(type_counts.items(), key=lambda item: -item[1])[:3]
+
+        return (f"Wave {number}: {format_timestamp(wave[0][0])} - {format_timestamp(wave[-1][0])}, {len(wave)} events, "
+                f"top violation types: {', '.join(f'{name} ({count})' for name, count in top_types)}")
+
+    @staticmethod
+    def group_events(timed_logs, token_budget):
+        """Collapses identical (description, violationType, uri) events and keeps the most frequent groups within the budget
+
+        Returns (lines, omitted groups, omitted events).
+        """
+        groups = {}
+        for timestamp, log in timed_logs:
+            key = (log["description"], log["violationType"], log.get("uri", "N/A"))
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [1, timestamp, timestamp]
+            else:
+                group[0] += 1
+                group[2] = timestamp
+
+        lines = []
+        used_tokens = 0
+        ranked = sorted(groups.items(), key=lambda item: (-item[1][0], item[1][1]))  # Most frequent first, then oldest
+        for position, ((description, violation_type, uri), (count, first, last)) in enumerate(ranked):
+            line = (f"Description:{description}, Violation Type:{violation_type}, Target URI: {uri}, "
+                    f"Count: {count}, First seen: {format_timestamp(first)}, Last seen: {format_timestamp(last)}")
+            used_tokens += estimate_tokens(line)
+            if used_tokens > token_budget and lines:
+                omitted = ranked[position:]
+                return lines, len(omitted), sum(group[0] for _, group in omitted)
+            lines.append(line)
+        return lines, 0, 0
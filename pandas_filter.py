@@ -0,0 +1,103 @@
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from filter import Filter
+from timestamps import parse_timestamp
+
+
+def parse_timestamp_or_none(value):
+    """Returns the epoch seconds of a timestamp, or None when it can't be parsed"""
+    try:
+        return parse_timestamp(value)
+    except ValueError:
+        return None
+
+
+class PandasFilter(Filter):
+    """Vectorized Filter backend: the same rules and results, evaluated column-wise with pandas"""
+
+    COLUMNS = ["externalIp", "violationCategory", "violationType", "uri", "description", "receivedTimeFormatted"]
+
+    def __init__(self, file_path, rules=None):
+        """Initialize the filter with log file path and rule set and prepare data structures"""
+        super().__init__(file_path, rules)
+        self.frame = None  # The log columns used by the rules
+        self.category_counts = None  # Series with (externalIp, violationCategory) index and event counts
+        self.counts = None  # The same counts as an IP x category table
+        self._filtered_ips = None  # IP of every entry in self.filtered, for aggregation
+
+    def create_ip_activities(self):
+        """Reads only the used columns and counts the attack categories of every IP"""
+        self.frame = pd.read_csv(
+            self.file_path,
+            usecols=self.COLUMNS,
+            dtype={"externalIp": "category", "violationCategory": "category", "violationType": str, "uri": str,
+                   "description": str, "receivedTimeFormatted": str},
+            keep_default_na=False,  # Empty fields stay empty strings, as with csv.DictReader
+            encoding="utf-8"
+        )
+
+        # Parse every distinct timestamp once and broadcast the epochs to the rows
+        times = self.frame["receivedTimeFormatted"].astype("category")
+        parsed = [parse_timestamp_or_none(value) for value in times.cat.categories]
+        codes = times.cat.codes.to_numpy()
+        self.frame["receivedEpoch"] = np.array([-1 if epoch is None else epoch for epoch in parsed], dtype=np.int64)[codes]
+        valid = np.array([epoch is not None for epoch in parsed], dtype=bool)[codes]
+        if not valid.all():
+            # Rows with an unparsable timestamp are left out, as in the row-by-row backend
+            self.skipped_rows = int(len(valid) - valid.sum())
+            self.frame = self.frame.loc[valid].reset_index(drop=True)
+            self.report_skipped_rows()
+
+        self.category_counts = self.frame.groupby(["externalIp", "violationCategory"], observed=True, sort=False).size()
+        for (ip, attack_type), count in self.category_counts.items():
+            self.ip_activities.setdefault(ip, Counter())[attack_type] = int(count)
+
+    def filter_logs(self):
+        """Applies filtering rules to logs"""
+        self.counts = self.category_counts.unstack(fill_value=0)
+        distinct_categories = (self.counts > 0).sum(axis=1)
+
+        self.flag_thresholds()
+
+        # Each matching keep rule keeps one copy of the row, as in the row-by-row backend
+        attack_type = self.frame["violationCategory"]
+        row_distinct_categories = self.frame["externalIp"].map(distinct_categories).to_numpy(dtype=np.int64)
+        copies = np.zeros(len(self.frame), dtype=np.int8)
+        for rule in self.rules.keep_rules:
+            mask = ~attack_type.isin(rule.exclude_categories).to_numpy()
+            if rule.categories is not None:
+                mask &= attack_type.isin(rule.categories).to_numpy()
+            if rule.uris is not None:
+                mask &= self.frame["uri"].isin(rule.uris).to_numpy()
+            if rule.min_distinct_categories is not None:
+                mask &= row_distinct_categories >= rule.min_distinct_categories
+            copies += mask
+
+        kept = copies > 0
+        # Materialize only the kept rows as dicts, column lists are much faster than DataFrame.to_dict
+        kept_frame = self.frame.loc[kept]
+        names = list(kept_frame.columns)
+        records = [dict(zip(names, values)) for values in zip(*(kept_frame[name].tolist() for name in names))]
+        positions = np.repeat(np.arange(len(records)), copies[kept])
+        self.filtered = [records[position] for position in positions]
+        self._filtered_ips = self.frame["externalIp"].to_numpy()[kept][positions]
+
+    def threshold_candidates(self, threshold):
+        """Returns the IPs whose total count of the threshold's category reaches it"""
+        if threshold.category not in self.counts.columns:
+            return set()
+        return set(self.counts.index[self.counts[threshold.category] >= threshold.min_count])
+
+    def threshold_epochs(self, attack_type, ips):
+        """Returns the event times of one category for the given IPs"""
+        rows = self.frame.loc[(self.frame["violationCategory"] == attack_type) & self.frame["externalIp"].isin(ips)]
+        return {ip: epochs.tolist() for ip, epochs in rows.groupby("externalIp", observed=True)["receivedEpoch"]}
+
+    def aggregate_by_ip(self):
+        """Groups all filtered logs by IP"""
+        groups = pd.Series(np.arange(len(self.filtered))).groupby(self._filtered_ips, sort=False, observed=True).indices
+        for ip in sorted(groups, key=lambda group_ip: groups[group_ip][0]):  # IPs in order of their first filtered log
+            self.aggregated_attackers[ip] = [self.filtered[position] for position in groups[ip]]
@@ -0,0 +1,168 @@
+import cProfile
+import json
+import math
+import os
+import sys
+import threading
+import time
+
+from contextlib import contextmanager
+
+METRIC_PREFIX = "waf_analyzer"  # Prefix of the Prometheus metric names
+
+
+class StageTimer:
+    """Wall and CPU time of one pipeline stage, with the number of items it processed"""
+    __slots__ = ("wall", "cpu", "calls", "items", "unit")
+
+    def __init__(self, unit=None):
+        self.wall = 0.0
+        self.cpu = 0.0  # CPU time of the threads that ran the stage
+        self.calls = 0
+        self.items = 0  # Rows, IPs... processed, for the throughput
+        self.unit = unit
+
+
+class Profiler:
+    def __init__(self):
+        """Initialize empty stage timers, counters, latency samples and token usage; safe to share between threads"""
+        self.stages = {}  # Stage name -> StageTimer, in the order the stages first ran
+        self.counters = {}  # Counter name -> count, e.g. llm_retries
+        self.samples = {}  # Histogram name -> list of observed values, e.g. llm_latency_seconds
+        self.token_usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}  # Summed from the API `usage` fields
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, unit=None):
+        """Times a block as a stage; set `items` on the yielded record to report a throughput in `unit`s per second"""
+        record = StageTimer(unit)
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield record
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+            with self.lock:
+                timer = self.stages.setdefault(name, StageTimer(unit))
+                timer.wall += wall
+                timer.cpu += cpu
+                timer.calls += 1
+                timer.items += record.items
+
+    def count(self, name, amount=1):
+        """Adds amount to a counter"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value):
+        """Records one value of a histogram"""
+        with self.lock:
+            self.samples.setdefault(name, []).append(value)
+
+    def add_usage(self, usage):
+        """Adds the token usage reported by the API for one request"""
+        if not isinstance(usage, dict):
+            return
+        with self.lock:
+            for key in self.token_usage:
+                value = usage.get(key)
+                if isinstance(value, (int, float)):
+                    self.token_usage[key] += int(value)
+
+    @staticmethod
+    def percentile(sorted_values, share):
+        """Returns the nearest-rank percentile of sorted values"""
+        rank = max(0, min(len(sorted_values) - 1, math.ceil(share * len(sorted_values)) - 1))
+        return sorted_values[rank]
+
+    def report(self):
+        """Returns every measurement as a JSON-serializable dict"""
+        with self.lock:
+            stages = {
+                name: {
+                    "wall_seconds": timer.wall,
+                    "cpu_seconds": timer.cpu,
+                    "calls": timer.calls,
+                    **({"items": timer.items, "unit": timer.unit, "per_second": timer.items / timer.wall if timer.wall else 0.0} if timer.unit else {}),
+                }
+                for name, timer in self.stages.items()
+            }
+            histograms = {}
+            for name, values in self.samples.items():
+                ordered = sorted(values)
+                histograms[name] = {
+                    "count": len(ordered),
+                    "sum": sum(ordered),
+                    "max": ordered[-1],
+                    **{f"p{share}": self.percentile(ordered, share / 100) for share in (50, 95, 99)},
+                }
+            return {"stages": stages, "counters": dict(self.counters), "histograms": histograms, "token_usage": dict(self.token_usage)}
+
+    def print_summary(self, file=sys.stderr):
+        """Prints a readable timing report, to stderr by default so JSON output stays clean"""
+        report = self.report()
+        print("Profile:", file=file)
+        for name, stage in report["stages"].items():
+            line = f"  {name:<24} {stage['wall_seconds']:9.3f}s wall {stage['cpu_seconds']:9.3f}s CPU"
+            if "unit" in stage:
+                line += f"  {stage['items']:,} {stage['unit']} ({stage['per_second']:,.0f} {stage['unit']}/s)"
+            print(line, file=file)
+        for name, histogram in report["histograms"].items():
+            print(f"  {name}: p50 {histogram['p50']:.3f} p95 {histogram['p95']:.3f} p99 {histogram['p99']:.3f} "
+                  f"max {histogram['max']:.3f} over {histogram['count']}", file=file)
+        if report["counters"]:
+            print("  " + ", ".join(f"{name} {value}" for name, value in sorted(report["counters"].items())), file=file)
+        usage = report["token_usage"]
+        print(f"  LLM tokens: {usage['prompt_tokens']} prompt, {usage['completion_tokens']} completion, {usage['total_tokens']} total", file=file)
+
+    def write(self, path, report_format="json"):
+        """Writes the report as JSON or as a Prometheus textfile, replacing the file atomically for collectors"""
+        text = json.dumps(self.report(), indent=2) if report_format == "json" else self.prometheus_text()
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        os.replace(temporary_path, path)
+
+    def prometheus_text(self):
+        """Formats the report in the Prometheus text exposition format (for the node_exporter textfile collector)"""
+        report = self.report()
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+                lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}" if label_text else f"{METRIC_PREFIX}_{name} {value}")
+
+        stages = report["stages"]
+        metric("stage_wall_seconds", "gauge", "Wall time spent in each pipeline stage.", [({"stage": name}, stage["wall_seconds"]) for name, stage in stages.items()])
+        metric("stage_cpu_seconds", "gauge", "CPU time spent in each pipeline stage.", [({"stage": name}, stage["cpu_seconds"]) for name, stage in stages.items()])
+        metric("stage_items_per_second", "gauge", "Throughput of each pipeline stage.",
+               [({"stage": name, "unit": stage["unit"]}, stage["per_second"]) for name, stage in stages.items() if "unit" in stage])
+        for name, value in sorted(report["counters"].items()):
+            metric(f"{name}_total", "counter", f"Number of {name.replace('_', ' ')}.", [({}, value)])
+        for name, histogram in report["histograms"].items():
+            samples = [({"quantile": str(share / 100)}, histogram[f"p{share}"]) for share in (50, 95, 99)]
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} Observed {name.replace('_', ' ')}.")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} summary")
+            lines.extend(f'{METRIC_PREFIX}_{name}{{quantile="{labels["quantile"]}"}} {value}' for labels, value in samples)
+            lines.append(f"{METRIC_PREFIX}_{name}_sum {histogram['sum']}")
+            lines.append(f"{METRIC_PREFIX}_{name}_count {histogram['count']}")
+        metric("llm_tokens_total", "counter", "LLM tokens reported by the API usage field.", [({"type": key.removesuffix("_tokens")}, value) for key, value in report["token_usage"].items()])
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def cprofile_dump(path):
+    """Records a cProfile of the calling thread into path (pstats format) while the block runs, or does nothing without a path"""
+    if not path:
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
+        print(f"cProfile written to {path} (inspect with: python -m pstats {path})", file=sys.stderr)
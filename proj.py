@@ -1,36 +1,144 @@
 import argparse
+import glob
 import subprocess
 import sys
 import os
+import threading
 
 from json_runner import json_runner
+from profiler import Profiler, cprofile_dump
+from result_store import ResultStore
+from retry import LLMAuthError
+from store_runner import store_runner
+from stream_runner import stream_runner
 
 
-def run_json_mode(api_key, file_path):
-    """Runs the project in JSON mode"""
-    json_runner(api_key, file_path)
+def llm_options(args):
+    """Collects the LLM options shared by all modes"""
+    return {
+        "concurrency": args.concurrency,
+        "requests_per_minute": args.rpm,
+        "tokens_per_minute": args.tpm,
+        "api_url": args.api_url,
+        "max_attempts": args.max_attempts,
+        "cache_path": None if args.no_cache else args.cache_path,
+        "cache_ttl_hours": args.cache_ttl_hours,
+        "token_budget": args.token_budget,
+        "batch_size": args.batch_size,
+        "batch_token_budget": args.batch_token_budget,
+    }
 
 
-def run_ui_mode(api_key, file_path):
-    """Run the project in UI mode using Streamlit"""
-    os.environ["API_KEY"] = api_key  # Pass API key as an environment variable
-    os.environ["FILE_PATH"] = file_path
+def run_json_mode(api_key, file_paths, ordered, backend, workers, rules_path, profiler=None, jsonl_path=None, compression=None, resume=False, **llm_kwargs):
+    """Runs the project in JSON mode, or JSONL mode when jsonl_path is given"""
+    json_runner(api_key, file_paths, ordered=ordered, backend=backend, workers=workers, rules_path=rules_path, profiler=profiler,
+                jsonl_path=jsonl_path, compression=compression, resume=resume, **llm_kwargs)
+
+
+def run_follow_mode(api_key, file_path, window_seconds, idle_seconds, rules_path, profiler=None, **llm_kwargs):
+    """Runs the project in JSON mode over a growing log file or stdin"""
+    stream_runner(api_key, file_path, window_seconds, idle_seconds, rules_path=rules_path, profiler=profiler, **llm_kwargs)
+
+
+def run_store_mode(api_key, file_path, backend, workers, rules_path, result_store, reanalyze, **llm_kwargs):
+    """Analyzes the logs into the result store without starting the dashboard"""
+    store_runner(api_key, file_path, result_store, backend, rules_path, reanalyze, workers=workers, **llm_kwargs)
+
+
+def run_ui_mode(api_key, file_path, backend, workers, rules_path, result_store, reanalyze, **llm_kwargs):
+    """Run the project in UI mode: the analysis fills the result store in the background while Streamlit shows it"""
+    os.environ["RESULT_STORE"] = os.path.abspath(result_store)  # The dashboard only reads the store
+    os.environ["RESULT_SOURCE"] = ResultStore.source_key(file_path, rules_path)
+    analysis = threading.Thread(target=store_runner, args=(api_key, file_path, result_store, backend, rules_path, reanalyze), kwargs={"workers": workers, **llm_kwargs}, daemon=True)
+    analysis.start()
     subprocess.run([sys.executable, "-m", "streamlit", "run", "ui_runner.py"], check=True)  # Runs UI
 
 
+def expand_file_paths(patterns):
+    """Expands glob patterns into a sorted list of files, keeping plain paths (and '-') as given"""
+    file_paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        file_paths.extend(matches)
+    return file_paths
+
+
 def main():
     """Main function to handle CLI arguments"""
     parser = argparse.ArgumentParser(description="Run the project in either JSON or UI mode.")
-    parser.add_argument("--output", choices=["JSON", "UI"], required=True, help="Choose output mode: JSON or UI")
+    parser.add_argument("--output", choices=["JSON", "JSONL", "UI", "STORE"], required=True,
+                        help="Choose output mode: JSON, JSONL (one record per line), UI, or STORE (only fill the dashboard's result store)")
     parser.add_argument("--api_key", required=True, help="Provide the API key for authentication")
-    parser.add_argument("--file_path", required=True, help="Path to the WAF log file")
+    parser.add_argument("--file_path", required=True, nargs="+", help="Path(s) or glob(s) of the WAF log files ('-' for stdin with --follow)")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to read the logs (python backend, not with --follow); large files are split by byte ranges")
+    parser.add_argument("--rules", help="JSON rule file with keep rules, thresholds and attack sequences (default: rules.json)")
+    parser.add_argument("--backend", choices=["python", "pandas"], default="python", help="Filter backend: row by row or vectorized with pandas")
+    parser.add_argument("--follow", action="store_true", help="Keep reading the log as it grows and re-summarize changed attackers")
+    parser.add_argument("--window_seconds", type=int, default=3600, help="With --follow: time window of events kept per IP")
+    parser.add_argument("--idle_seconds", type=int, default=3600, help="With --follow: forget IPs without events for this long")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum number of LLM requests in flight")
+    parser.add_argument("--rpm", type=int, help="LLM provider quota in requests per minute")
+    parser.add_argument("--tpm", type=int, help="LLM provider quota in tokens per minute")
+    parser.add_argument("--ordered", action="store_true", help="Print JSON results in input order instead of completion order")
+    parser.add_argument("--max_attempts", type=int, default=5, help="LLM attempts per IP before falling back to a rule-based summary")
+    parser.add_argument("--cache_path", default=".summary_cache.sqlite", help="SQLite file caching LLM summaries between runs")
+    parser.add_argument("--cache_ttl_hours", type=int, default=168, help="Hours before a cached summary expires")
+    parser.add_argument("--no_cache", action="store_true", help="Always ask the LLM, ignoring the summary cache")
+    parser.add_argument("--token_budget", type=int, default=3000, help="Maximum estimated tokens of the logs sent per IP")
+    parser.add_argument("--batch_size", type=int, default=1, help="Pack up to this many low-volume IPs into one LLM request (1 disables batching)")
+    parser.add_argument("--batch_token_budget", type=int, default=6000, help="Maximum estimated tokens of the attacker logs in one batched request")
+    parser.add_argument("--api_url", help="Override the chat completions endpoint (e.g. a local mock server)")
+    parser.add_argument("--output_path", default="-", help="JSONL mode: file to write ('-' for stdout); .gz and .zst are compressed")
+    parser.add_argument("--compression", choices=["gzip", "zstd"], help="JSONL mode: compress the output (default: from the file extension)")
+    parser.add_argument("--resume", action="store_true", help="JSONL mode: keep the records of an interrupted run in --output_path and skip their IPs")
+    parser.add_argument("--result_store", default=".results.sqlite", help="UI/STORE mode: SQLite file holding the analysis results the dashboard reads")
+    parser.add_argument("--reanalyze", action="store_true", help="UI/STORE mode: analyze again even if the store has a finished run of the same input")
+    parser.add_argument("--profile", action="store_true", help="JSON mode: print per-stage timings, LLM latencies, token usage and retry counts to stderr")
+    parser.add_argument("--profile_output", help="Write the profile report to this file (implies --profile)")
+    parser.add_argument("--profile_format", choices=["json", "prometheus"], default="json", help="Format of --profile_output (prometheus: node_exporter textfile)")
+    parser.add_argument("--cprofile", help="JSON mode: write a cProfile dump of the main thread (ingest, filtering, detection) to this file")
 
     args = parser.parse_args()
+    file_paths = expand_file_paths(args.file_path)
+
+    if not file_paths:
+        parser.error("--file_path matched no files")
+    if len(file_paths) > 1 and (args.follow or args.output in ("UI", "STORE") or args.backend == "pandas"):
+        parser.error("Several log files are only supported in JSON mode with the python backend")
+    if args.workers > 1 and args.backend == "pandas":
+        parser.error("--workers is only supported with the python backend")
+    if args.workers > 1 and args.follow:
+        parser.error("--workers is not supported with --follow, which reads the log as it grows")
+
+    if args.follow and args.output != "JSON":
+        parser.error("--follow is only supported with --output JSON")
+    if args.resume and args.output_path == "-":
+        parser.error("--resume needs an --output_path file")
+
+    if (args.profile or args.profile_output or args.cprofile) and args.output in ("UI", "STORE"):
+        parser.error("--profile, --profile_output and --cprofile are only supported with --output JSON or JSONL")
 
-    if args.output == "JSON":
-        run_json_mode(args.api_key, args.file_path)
-    elif args.output == "UI":
-        run_ui_mode(args.api_key, args.file_path)
+    profiler = Profiler() if args.profile or args.profile_output else None
+    try:
+        if args.output in ("JSON", "JSONL"):
+            with cprofile_dump(args.cprofile):
+                if args.follow:
+                    run_follow_mode(args.api_key, file_paths[0], args.window_seconds, args.idle_seconds, args.rules, profiler, **llm_options(args))
+                elif args.output == "JSONL":
+                    run_json_mode(args.api_key, file_paths, args.ordered, args.backend, args.workers, args.rules, profiler,
+                                  args.output_path, args.compression, args.resume, **llm_options(args))
+                else:
+                    run_json_mode(args.api_key, file_paths, args.ordered, args.backend, args.workers, args.rules, profiler, **llm_options(args))
+            if profiler:
+                profiler.print_summary()
+                if args.profile_output:
+                    profiler.write(args.profile_output, args.profile_format)
+        elif args.output == "UI":
+            run_ui_mode(args.api_key, file_paths[0], args.backend, args.workers, args.rules, args.result_store, args.reanalyze, **llm_options(args))
+        elif args.output == "STORE":
+            run_store_mode(args.api_key, file_paths[0], args.backend, args.workers, args.rules, args.result_store, args.reanalyze, **llm_options(args))
+    except LLMAuthError as error:
+        parser.exit(1, f"The LLM API rejected the request ({error}), check --api_key\n")
 
 
 if __name__ == "__main__":
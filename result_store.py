@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from rollups import ALL_IPS, RESOLUTIONS
+
+
+class ResultStore:
+    def __init__(self, path):
+        """Initialize an SQLite store of analysis runs, their attack summaries and event count rollups, shared by the analysis and the dashboard"""
+        self.lock = threading.Lock()  # One connection, used by the analysis thread or by every dashboard session
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")  # The dashboard reads while the analysis writes
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # One commit per summary stays cheap
+        self.connection.executescript(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "id INTEGER PRIMARY KEY, source TEXT NOT NULL, status TEXT NOT NULL, started REAL NOT NULL, finished REAL, "
+            "total_ips INTEGER, summarized INTEGER NOT NULL DEFAULT 0);"
+            "CREATE INDEX IF NOT EXISTS runs_source ON runs (source, id);"
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "run_id INTEGER NOT NULL, position INTEGER NOT NULL, attacker_ip TEXT NOT NULL, events INTEGER NOT NULL, "
+            "sequence TEXT, summary_source TEXT NOT NULL, attack_summary TEXT, attack_types TEXT, suggested_mitigation TEXT, "
+            "record TEXT NOT NULL, PRIMARY KEY (run_id, attacker_ip));"
+            "CREATE INDEX IF NOT EXISTS summaries_position ON summaries (run_id, position);"
+            "CREATE TABLE IF NOT EXISTS rollups ("
+            "run_id INTEGER NOT NULL, resolution INTEGER NOT NULL, attacker_ip TEXT NOT NULL, bucket INTEGER NOT NULL, "
+            "category TEXT NOT NULL, count INTEGER NOT NULL, PRIMARY KEY (run_id, resolution, attacker_ip, bucket, category)"
+            ") WITHOUT ROWID;"
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def source_key(file_path, rules_path=None):
+        """Identifies the analyzed input: the log file as it is now and the rule file, so changed inputs get a new run"""
+        stat = os.stat(file_path)
+        return json.dumps([os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, os.path.abspath(rules_path) if rules_path else None])
+
+    # ------------------------ Writing (analysis) ------------------------
+
+    def start_run(self, source):
+        """Registers a new run of the analysis and returns its id"""
+        with self.lock:
+            run_id = self.connection.execute(
+                "INSERT INTO runs (source, status, started) VALUES (?, 'analyzing', ?)", (source, time.time())
+            ).lastrowid
+            self.connection.commit()
+        return run_id
+
+    def set_attackers(self, run_id, total_ips, rollups):
+        """Records how many IPs the run will summarize and its event count rollups (see rollups.compute_rollups)"""
+        with self.lock:
+            for resolution, counts in rollups.items():
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO rollups (run_id, resolution, attacker_ip, bucket, category, count) VALUES (?, ?, ?, ?, ?, ?)",
+                    ((run_id, resolution, ip, bucket, str(category), count) for (bucket, category, ip), count in counts.items())
+                )
+            self.connection.execute("UPDATE runs SET status = 'summarizing', total_ips = ? WHERE id = ?", (total_ips, run_id))
+            self.connection.commit()
+
+    def put_summary(self, run_id, attacker_ip, summary, events, sequence=None):
+        """Stores the summary of one attacker; it is visible to the dashboard right away"""
+        attack_types = summary.get("attack_types", [])
+        with self.lock:
+            position = self.connection.execute("SELECT summarized FROM runs WHERE id = ?", (run_id,)).fetchone()[0]
+            self.connection.execute(
+                "INSERT OR REPLACE INTO summaries (run_id, position, attacker_ip, events, sequence, summary_source, attack_summary, "
+                "attack_types, suggested_mitigation, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, position, attacker_ip, events, sequence, summary.get("summary_source", "llm"), summary.get("attack_summary"),
+                 ", ".join(map(str, attack_types)) if isinstance(attack_types, list) else str(attack_types),
+                 summary.get("suggested_mitigation"), json.dumps(summary))
+            )
+            self.connection.execute("UPDATE runs SET summarized = summarized + 1 WHERE id = ?", (run_id,))
+            self.connection.commit()
+
+    def finish_run(self, run_id, status="done"):
+        """Marks a run as done, or as failed"""
+        with self.lock:
+            self.connection.execute("UPDATE runs SET status = ?, finished = ? WHERE id = ?", (status, time.time(), run_id))
+            self.connection.commit()
+
+    # ------------------------ Reading (dashboard) ------------------------
+
+    def latest_run(self, source=None):
+        """Returns the newest run, of one source if given, as a dict, or None"""
+        query = "SELECT id, source, status, started, finished, total_ips, summarized FROM runs"
+        parameters = ()
+        if source is not None:
+            query += " WHERE source = ?"
+            parameters = (source,)
+        with self.lock:
+            row = self.connection.execute(query + " ORDER BY id DESC LIMIT 1", parameters).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("id", "source", "status", "started", "finished", "total_ips", "summarized"), row))
+
+    def count_summaries(self, run_id, search=""):
+        """Returns the number of summaries of a run whose IP contains search"""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM summaries WHERE run_id = ? AND instr(attacker_ip, ?) > 0", (run_id, search)
+            ).fetchone()[0]
+
+    def page(self, run_id, search="", offset=0, limit=50):
+        """Returns one page of the summaries of a run whose IP contains search, in the order they were stored"""
+        with self.lock:
+            cursor = self.connection.execute(
+                "SELECT attacker_ip, events, sequence, summary_source, attack_summary, attack_types, suggested_mitigation "
+                "FROM summaries WHERE run_id = ? AND instr(attacker_ip, ?) > 0 ORDER BY position LIMIT ? OFFSET ?",
+                (run_id, search, limit, offset)
+            )
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def summary(self, run_id, attacker_ip):
+        """Returns the full stored summary of one attacker, or None"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT record FROM summaries WHERE run_id = ? AND attacker_ip = ?", (run_id, attacker_ip)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def rollup_span(self, run_id):
+        """Returns the first and last minute with filtered events of a run and its violation categories, or None"""
+        with self.lock:
+            first, last = self.connection.execute(
+                "SELECT MIN(bucket), MAX(bucket) FROM rollups WHERE run_id = ? AND resolution = ? AND attacker_ip = ?",
+                (run_id, min(RESOLUTIONS.values()), ALL_IPS)
+            ).fetchone()
+            categories = self.connection.execute(
+                "SELECT DISTINCT category FROM rollups WHERE run_id = ? AND resolution = ? AND attacker_ip = ? ORDER BY category",
+                (run_id, max(RESOLUTIONS.values()), ALL_IPS)
+            ).fetchall()
+        if first is None:
+            return None
+        return first, last, [category for category, in categories]
+
+    def rollup(self, run_id, resolution, start=None, end=None, ips=None, categories=None):
+        """Returns the (bucket start epoch, category, filtered events) counts of a run at one resolution, in time order
+
+        Only buckets in [start, end] are returned. ips and categories narrow the counts to some attackers or violation
+        categories; the events of every attacker are read from the precomputed totals.
+        """
+        query = "SELECT bucket, category, SUM(count) FROM rollups WHERE run_id = ? AND resolution = ? AND bucket BETWEEN ? AND ?"
+        parameters = [run_id, resolution, start if start is not None else -2 ** 63, end if end is not None else 2 ** 63 - 1]
+        ips = list(ips) if ips else [ALL_IPS]
+        query += f" AND attacker_ip IN ({', '.join('?' * len(ips))})"
+        parameters += ips
+        if categories:
+            query += f" AND category IN ({', '.join('?' * len(categories))})"
+            parameters += list(categories)
+        with self.lock:
+            return self.connection.execute(query + " GROUP BY bucket, category ORDER BY bucket", parameters).fetchall()
+
+    def close(self):
+        """Closes the database"""
+        self.connection.close()
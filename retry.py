@@ -0,0 +1,96 @@
+import random
+import sys
+import threading
+import time
+
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class LLMResponseError(Exception):
+    def __init__(self, message, retryable=True, retry_after=None, malformed=False):
+        """An LLM request that did not produce a usable summary"""
+        super().__init__(message)
+        self.retryable = retryable  # False for errors that will fail again (e.g. 401, 400)
+        self.retry_after = retry_after  # Seconds the server asked us to wait, if any
+        self.malformed = malformed  # The API answered, but the content was not valid JSON
+
+
+class LLMAuthError(LLMResponseError):
+    def __init__(self, message):
+        """The API rejected the credentials (401/403); every further request would fail the same way"""
+        super().__init__(message, retryable=False)
+
+
+def parse_retry_after(value):
+    """Converts a Retry-After header (seconds or HTTP date) to seconds, or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=5, max_malformed_attempts=2, base_delay=1.0, max_delay=60.0):
+        """Initialize the retry limits and the exponential backoff parameters"""
+        self.max_attempts = max_attempts  # Requests per IP before falling back to the rule-based summary
+        self.max_malformed_attempts = max_malformed_attempts  # Malformed-JSON answers tolerated per IP
+        self.base_delay = base_delay  # Backoff before the second attempt, doubled on every retry
+        self.max_delay = max_delay  # Upper bound for a single backoff
+
+    def delay(self, attempt, retry_after=None):
+        """Returns the seconds to wait after the given failed attempt (0-based), with full jitter"""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            # Never retry before the server allows it, jitter on top spreads out the workers
+            return retry_after + backoff / 2
+        return backoff
+
+
+class CircuitBreaker:
+    def __init__(self, failure_rate=0.5, window=20, min_calls=5, cooldown=30.0):
+        """Initialize a breaker that opens when failure_rate of the last window calls failed"""
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls  # Calls needed before the failure rate is trusted
+        self.cooldown = cooldown  # Seconds all workers pause once the breaker opens
+        self.outcomes = deque(maxlen=window)  # True for success, False for failure
+        self.open_until = 0.0
+        self.half_open = False  # After a pause, one more failure reopens the breaker immediately
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """Blocks while the breaker is open"""
+        while True:
+            with self.lock:
+                remaining = self.open_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def record(self, success):
+        """Records the outcome of a call and opens the breaker when the error rate spikes"""
+        with self.lock:
+            if self.half_open:
+                self.half_open = False
+                if not success:
+                    self._open()
+                return
+
+            self.outcomes.append(success)
+            failures = self.outcomes.count(False)
+            if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        """Pauses all workers for the cooldown (lock must be held)"""
+        print(f"LLM error rate too high, pausing requests for {self.cooldown:g}s", file=sys.stderr)
+        self.open_until = time.monotonic() + self.cooldown
+        self.outcomes.clear()
+        self.half_open = True
@@ -0,0 +1,38 @@
+from collections import Counter
+
+# Resolutions of the pre-aggregated event counts, in seconds
+RESOLUTIONS = {"1m": 60, "10m": 600, "1h": 3600, "1d": 86400}
+
+ALL_IPS = ""  # attacker_ip of the rollup rows that count the events of every IP
+
+
+def compute_rollups(aggregated_attackers):
+    """Counts the filtered events of every IP per violation category at every resolution
+
+    Returns {resolution seconds: Counter of (bucket start epoch, category, IP or ALL_IPS) -> events}. The events are
+    bucketed per minute once; the coarser resolutions are summed from the minutes.
+    """
+    finest = min(RESOLUTIONS.values())
+    minutes = Counter()
+    for ip, logs in aggregated_attackers.items():
+        ip_minutes = Counter((log["receivedEpoch"] // finest * finest, log["violationCategory"]) for log in logs)
+        for (bucket, category), count in ip_minutes.items():
+            minutes[bucket, category, ip] += count
+
+    rollups = {}
+    for resolution in RESOLUTIONS.values():
+        counts = Counter()
+        for (bucket, category, ip), count in minutes.items():
+            bucket = bucket // resolution * resolution
+            counts[bucket, category, ip] += count
+            counts[bucket, category, ALL_IPS] += count  # Totals, so the unfiltered chart doesn't sum over every IP
+        rollups[resolution] = counts
+    return rollups
+
+
+def pick_resolution(start, end, max_points=1500):
+    """Returns the finest resolution that shows the time range [start, end] in at most max_points buckets"""
+    for resolution in sorted(RESOLUTIONS.values()):
+        if (end - start) / resolution <= max_points:
+            return resolution
+    return max(RESOLUTIONS.values())
@@ -0,0 +1,172 @@
+import json
+import os
+
+from collections import deque
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json")
+
+
+class KeepRule:
+    """A rule that keeps a log row; every matching rule keeps one copy of it"""
+    __slots__ = ("name", "categories", "exclude_categories", "uris", "min_distinct_categories")
+
+    def __init__(self, name, categories=None, exclude_categories=(), uris=None, min_distinct_categories=None):
+        self.name = name
+        self.categories = set(categories) if categories is not None else None  # None matches every category
+        self.exclude_categories = set(exclude_categories)
+        self.uris = set(uris) if uris is not None else None  # None matches every URI
+        self.min_distinct_categories = min_distinct_categories  # Distinct categories the IP needs, None for no limit
+
+    def matches_category(self, attack_type):
+        """Checks the category conditions, the only ones that don't depend on the row or IP"""
+        return (self.categories is None or attack_type in self.categories) and attack_type not in self.exclude_categories
+
+
+class Threshold:
+    """Flags an IP once it has min_count events of a category, within window_seconds when a window is set"""
+    __slots__ = ("name", "category", "min_count", "window_seconds")
+
+    def __init__(self, name, category, min_count, window_seconds=None):
+        self.name = name
+        self.category = category
+        self.min_count = min_count
+        self.window_seconds = window_seconds  # None counts all events of the IP
+
+
+class SlidingWindowCounter:
+    """Counts events in the last window_seconds and remembers the peak, in O(1) amortized per event
+
+    Events are expected in time order; an event older than the newest one is counted at the newest time.
+    """
+    __slots__ = ("window_seconds", "buckets", "total", "peak", "peak_start", "peak_end")
+
+    def __init__(self, window_seconds):
+        self.window_seconds = window_seconds
+        self.buckets = deque()  # [timestamp, count] pairs, one per distinct timestamp inside the window
+        self.total = 0  # Events inside the window
+        self.peak = 0  # Highest number of events seen inside one window
+        self.peak_start = None  # First and last event time of the peak window
+        self.peak_end = None
+
+    def add(self, timestamp):
+        """Counts one event and returns the number of events in the window ending at it"""
+        buckets = self.buckets
+        if buckets and timestamp <= buckets[-1][0]:
+            buckets[-1][1] += 1
+            timestamp = buckets[-1][0]
+        else:
+            buckets.append([timestamp, 1])
+        self.total += 1
+
+        while buckets[0][0] <= timestamp - self.window_seconds:
+            self.total -= buckets.popleft()[1]
+
+        if self.total > self.peak:
+            self.peak = self.total
+            self.peak_start = buckets[0][0]
+            self.peak_end = timestamp
+        return self.total
+
+
+class Sequence:
+    """An N-stage attack sequence: each stage is a set of categories that must follow the previous stage"""
+    __slots__ = ("name", "stages", "window_seconds")
+
+    def __init__(self, name, stages, window_seconds=None):
+        if len(stages) < 2:
+            raise ValueError(f"Sequence {name!r} needs at least two stages")
+        self.name = name
+        self.stages = [set(stage) for stage in stages]
+        self.window_seconds = window_seconds  # Maximum time between consecutive stages, None for no limit
+
+
+class RuleSet:
+    def __init__(self, keep_rules, thresholds, sequences):
+        """Initialize the rule set and compile its per-category lookup tables"""
+        self.keep_rules = keep_rules
+        self.thresholds = thresholds
+        self.sequences = sequences
+        self._keep_rules_by_category = {}  # Category -> keep rules whose category conditions pass, filled lazily
+
+        # Sequence transitions per category: (sequence index, stage index), later stages first, so one event
+        # never advances a sequence twice. An event only touches the sequences that mention its category.
+        self.transitions = {}
+        for sequence_index, sequence in enumerate(sequences):
+            for stage_index, stage in enumerate(sequence.stages):
+                for attack_type in stage:
+                    self.transitions.setdefault(attack_type, []).append((sequence_index, stage_index))
+        for steps in self.transitions.values():
+            steps.sort(key=lambda step: (step[0], -step[1]))
+
+        # Offset of every sequence in the flat per-IP state list
+        self.state_offsets = []
+        offset = 0
+        for sequence in sequences:
+            self.state_offsets.append(offset)
+            offset += len(sequence.stages)
+        self.state_size = offset
+
+    @classmethod
+    def load(cls, path=None):
+        """Loads a rule file (JSON), the bundled rules.json by default"""
+        with open(path or DEFAULT_RULES_PATH, 'r', encoding='utf-8') as file:
+            config = json.load(file)
+
+        try:
+            return cls(
+                [KeepRule(**rule) for rule in config.get("keep_rules", [])],
+                [Threshold(**threshold) for threshold in config.get("thresholds", [])],
+                [Sequence(**sequence) for sequence in config.get("sequences", [])]
+            )
+        except TypeError as error:
+            raise ValueError(f"Invalid rule file {path or DEFAULT_RULES_PATH}: {error}") from error
+
+    def keep_rules_for(self, attack_type):
+        """Returns the keep rules that can match a category"""
+        rules = self._keep_rules_by_category.get(attack_type)
+        if rules is None:
+            rules = self._keep_rules_by_category[attack_type] = [rule for rule in self.keep_rules if rule.matches_category(attack_type)]
+        return rules
+
+    def matching_rules(self, attack_type, uri, distinct_categories):
+        """Returns how many keep rules match a row of an IP with the given number of distinct categories"""
+        matches = 0
+        for rule in self.keep_rules_for(attack_type):
+            if rule.uris is not None and uri not in rule.uris:
+                continue
+            if rule.min_distinct_categories is not None and distinct_categories < rule.min_distinct_categories:
+                continue
+            matches += 1
+        return matches
+
+    def windowed_thresholds(self):
+        """Returns the thresholds that count events inside a time window"""
+        return [threshold for threshold in self.thresholds if threshold.window_seconds is not None]
+
+    def new_sequence_state(self):
+        """Returns the state of an IP that has not started any sequence: the time each stage was last reached"""
+        return [None] * self.state_size
+
+    def step(self, state, attack_type, timestamp):
+        """Advances the sequence state of an IP by one event and returns the name of the sequence it completed, or None
+
+        When an event completes several sequences the last one in the rule file wins.
+        """
+        completed = None
+        for sequence_index, stage_index in self.transitions.get(attack_type, ()):
+            position = self.state_offsets[sequence_index] + stage_index
+            if stage_index == 0:
+                state[position] = timestamp  # The latest start of the sequence counts
+                continue
+
+            previous_time = state[position - 1]
+            if previous_time is None or timestamp <= previous_time:
+                continue  # The previous stage must happen strictly before this one
+            window_seconds = self.sequences[sequence_index].window_seconds
+            if window_seconds is not None and timestamp - previous_time > window_seconds:
+                continue
+
+            state[position] = timestamp
+            if stage_index == len(self.sequences[sequence_index].stages) - 1:
+                completed = self.sequences[sequence_index].name
+        return completed
@@ -0,0 +1,95 @@
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+from event_store import EventStore
+from filter import Filter
+
+SCAN_CHUNK_BYTES = 1 << 20  # Read size when counting quotes up to a shard boundary
+
+
+def record_starts(path, offsets):
+    """Moves every byte offset (ascending) forward to the start of the next CSV record and returns the distinct starts
+
+    A line only starts a record when the bytes before it hold an even number of quotes; otherwise it continues a
+    quoted field, e.g. a multi-line description. Quotes are counted in one pass from the start of the file.
+    """
+    starts = []
+    with open(path, 'rb') as file:
+        quotes = 0
+        position = 0  # Bytes read so far, all of them counted in quotes
+        for offset in offsets:
+            if offset <= position:
+                continue  # The previous record ran past this offset
+            while position < offset - 1:
+                chunk = file.read(min(SCAN_CHUNK_BYTES, offset - 1 - position))
+                quotes += chunk.count(b'"')
+                position += len(chunk)
+            while True:
+                line = file.readline()  # From the byte before offset, so a line starting at offset is found too
+                if not line:
+                    return starts
+                quotes += line.count(b'"')
+                position += len(line)
+                if quotes % 2 == 0:
+                    break
+            starts.append(position)
+    return starts
+
+
+def plan_shards(file_paths, workers):
+    """Splits the files into (path, start, end) byte ranges so every worker gets a similar amount of data
+
+    Ranges start at CSV record boundaries, so no shard starts inside a quoted field spanning several lines.
+    """
+    sizes = {path: os.path.getsize(path) for path in file_paths}
+    target = max(1, sum(sizes.values()) // workers)  # Bytes per shard for an even split
+
+    shards = []
+    for path in file_paths:
+        if not sizes[path]:
+            continue  # Empty file, not even a header
+        pieces = max(1, round(sizes[path] / target))
+        step = sizes[path] // pieces + 1
+        starts = [0] + [start for start in record_starts(path, range(step, sizes[path], step)) if start < sizes[path]]
+        shards.extend(zip([path] * len(starts), starts, starts[1:] + [sizes[path]]))
+    return shards
+
+
+def read_shard(shard):
+    """Reads the rows starting inside a byte range into an EventStore and counts their attack categories per IP
+
+    A row belongs to the shard its first byte is in; plan_shards starts ranges at record boundaries.
+    """
+    path, start, end = shard
+    store = EventStore()
+    store.read_csv(path, start, end)
+    return store, store.category_counts()
+
+
+class ShardedFilter(Filter):
+    """Filter over several files or byte ranges of one large file, ingested by a pool of processes"""
+
+    def __init__(self, file_paths, workers=os.cpu_count(), rules=None):
+        """Initialize the filter with the log files, the number of worker processes and the rule set"""
+        super().__init__(file_paths[0], rules)
+        self.file_paths = file_paths
+        self.workers = workers
+
+    def create_ip_activities(self):
+        """Reads all shards in parallel and merges their rows and per-IP counters in file order"""
+        shards = plan_shards(self.file_paths, self.workers)
+
+        if self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                self.merge_shards(pool.map(read_shard, shards))  # map keeps shard order, so the merge is deterministic
+        else:
+            self.merge_shards(map(read_shard, shards))
+        self.skipped_rows = self.events.skipped_rows
+        self.report_skipped_rows()
+
+    def merge_shards(self, partial_states):
+        """Merges (EventStore, ip_activities) partial states into this filter"""
+        for store, ip_activities in partial_states:
+            self.events.extend(store)
+            self.merge_activities(ip_activities)
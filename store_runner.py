@@ -0,0 +1,44 @@
+import sys
+
+from filter import create_filter
+from result_store import ResultStore
+from rollups import compute_rollups
+from summarizer import build_summarizer
+
+
+def store_runner(api_key, file_path, store_path, backend="python", rules_path=None, reanalyze=False, workers=1, **llm_kwargs):
+    """Analyzes the logs into a ResultStore, which the dashboard reads; a finished run of the same input is reused"""
+    store = ResultStore(store_path)
+    source = ResultStore.source_key(file_path, rules_path)
+    latest = store.latest_run(source)
+    if latest and latest["status"] == "done" and not reanalyze:
+        print(f"Reusing the stored analysis of {file_path} ({latest['summarized']} attackers)", file=sys.stderr)
+        store.close()
+        return
+
+    run_id = store.start_run(source)
+    filter_obj = None
+    try:
+        # Run the filtering and aggregation process
+        filter_obj = create_filter(file_path, backend, workers, rules_path)
+        filter_obj.create_ip_activities()
+        filter_obj.filter_logs()
+        filter_obj.aggregate_by_ip()
+        filter_obj.detect_attack_sequences()
+
+        # Event counts are rolled up once here, so the dashboard chart never reads the logs
+        store.set_attackers(run_id, len(filter_obj.aggregated_attackers), compute_rollups(filter_obj.aggregated_attackers))
+
+        # Summaries are stored as they complete, so the dashboard shows partial results
+        summarizer = build_summarizer(api_key, **llm_kwargs)
+        for ip, attack_summary_json in summarizer.summarize(filter_obj):
+            store.put_summary(run_id, ip, attack_summary_json, len(filter_obj.aggregated_attackers[ip]), filter_obj.multi_step_attacks.get(ip))
+        summarizer.close()
+        store.finish_run(run_id)
+    except BaseException:
+        store.finish_run(run_id, "failed")
+        raise
+    finally:
+        if filter_obj:
+            filter_obj.close()  # The lazy-load file handles would otherwise stay open while the dashboard runs
+        store.close()
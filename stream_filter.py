@@ -0,0 +1,197 @@
+import sys
+
+from bisect import bisect
+from collections import Counter, deque
+
+from filter import Filter
+from rule_engine import SlidingWindowCounter
+from timestamps import parse_timestamp
+
+
+class IPState:
+    """Sliding-window state of a single IP"""
+    __slots__ = ("events", "logs", "categories", "distinct_band", "rate_counters", "sequence_progress", "sequence",
+                 "last_seen", "summarized_signature")
+
+    def __init__(self, sequence_progress):
+        self.events = deque()  # (epoch, row, kept copies) of the events inside the time window, in arrival order
+        self.logs = deque()  # Kept logs of those events, every matching keep rule keeps one copy
+        self.categories = Counter()  # Attack categories of the events inside the time window
+        self.distinct_band = 0  # min_distinct_categories limits reached, the kept copies of a row only depend on this
+        self.rate_counters = {}  # Windowed threshold name -> SlidingWindowCounter of its category
+        self.sequence_progress = sequence_progress  # Sequence state machine, advanced by every kept event
+        self.sequence = None  # (name, epoch) of the last completed multistep attack sequence
+        self.last_seen = 0  # Latest event time of the IP
+        self.summarized_signature = None  # Signature of the state that was last summarized
+
+
+class StreamingFilter(Filter):
+    def __init__(self, window_seconds=3600, idle_seconds=3600, max_events_per_ip=10000, rules=None):
+        """Initialize the incremental filter with its time window, eviction limits and rule set"""
+        super().__init__(None, rules)
+        self.window_seconds = window_seconds  # Events older than this (relative to the IP's newest event) are dropped
+        self.idle_seconds = idle_seconds  # IPs without events for this long are evicted
+        self.max_events_per_ip = max_events_per_ip  # Hard cap on the events kept for a single IP
+        self.ip_states = {}  # Dictionary with IPs as keys and their IPState
+        self.touched_ips = set()  # IPs that received events since the last drain
+        self.latest_time = 0  # Newest event time seen in the stream
+        self.windowed_thresholds = {}  # Category -> windowed thresholds counting it
+        for threshold in self.rules.windowed_thresholds():
+            self.windowed_thresholds.setdefault(threshold.category, []).append(threshold)
+        self.distinct_limits = sorted({rule.min_distinct_categories for rule in self.rules.keep_rules if rule.min_distinct_categories is not None})
+
+    def add_row(self, row):
+        """Adds a single log row to the state of its IP, updating its kept logs and sequence state incrementally"""
+        ip = row["externalIp"]
+        attack_type = row["violationCategory"]
+        try:
+            timestamp = row["receivedEpoch"] = parse_timestamp(row["receivedTimeFormatted"])  # Parsed once, at ingest
+        except ValueError:
+            if not self.skipped_rows:
+                print(f"Skipping log rows with an unsupported receivedTimeFormatted, e.g. {row['receivedTimeFormatted']!r}", file=sys.stderr)
+            self.skipped_rows += 1
+            return
+
+        state = self.ip_states.get(ip)
+        if state is None:
+            state = self.ip_states[ip] = IPState(self.rules.new_sequence_state())
+            self.ip_activities[ip] = state.categories
+
+        state.categories[attack_type] += 1
+        for threshold in self.windowed_thresholds.get(attack_type, ()):
+            counter = state.rate_counters.get(threshold.name)
+            if counter is None:
+                counter = state.rate_counters[threshold.name] = SlidingWindowCounter(threshold.window_seconds)
+            counter.add(timestamp)
+        state.last_seen = max(state.last_seen, timestamp)
+        self.latest_time = max(self.latest_time, timestamp)
+
+        events = state.events
+        events.append((timestamp, row, 0))  # Kept copies are counted once the window is trimmed
+
+        # Drop events that left the time window or exceed the per-IP cap, with their kept logs
+        while events and (events[0][0] < state.last_seen - self.window_seconds or len(events) > self.max_events_per_ip):
+            _, old_row, old_copies = events.popleft()
+            for _ in range(old_copies):
+                state.logs.popleft()
+            old_type = old_row["violationCategory"]
+            state.categories[old_type] -= 1
+            if not state.categories[old_type]:
+                del state.categories[old_type]
+
+        # Rows are kept depending on the IP's distinct categories, so crossing a limit re-evaluates the window
+        distinct_band = bisect(self.distinct_limits, len(state.categories))
+        if distinct_band != state.distinct_band:
+            state.distinct_band = distinct_band
+            self.rebuild_kept_logs(state)
+        elif events and events[-1][1] is row:
+            copies = self.matching_rules(row, len(state.categories))
+            events[-1] = (timestamp, row, copies)
+            state.logs.extend([row] * copies)
+            if copies:
+                self.advance_sequence(state, row)
+
+        self.touched_ips.add(ip)
+
+    def advance_sequence(self, state, row):
+        """Feeds one kept event to the sequence state machine of its IP, forgetting stages reached before the window"""
+        cutoff = state.last_seen - self.window_seconds
+        progress = state.sequence_progress
+        for position, reached in enumerate(progress):
+            if reached is not None and reached < cutoff:
+                progress[position] = None
+        completed = self.rules.step(progress, row["violationCategory"], row["receivedEpoch"])
+        if completed:
+            state.sequence = (completed, row["receivedEpoch"])
+
+    def rebuild_kept_logs(self, state):
+        """Recomputes the kept logs and replays the sequence state of an IP over the events inside its window"""
+        distinct_categories = len(state.categories)
+        state.logs.clear()
+        state.sequence_progress = self.rules.new_sequence_state()
+        state.sequence = None
+        events = state.events
+        for position, (timestamp, row, _) in enumerate(events):
+            copies = self.matching_rules(row, distinct_categories)
+            events[position] = (timestamp, row, copies)
+            state.logs.extend([row] * copies)
+            if copies:
+                self.advance_sequence(state, row)
+
+    def evict_idle_ips(self):
+        """Forgets IPs that had no events for idle_seconds"""
+        cutoff = self.latest_time - self.idle_seconds
+        for ip in [ip for ip, state in self.ip_states.items() if state.last_seen < cutoff]:
+            del self.ip_states[ip]
+            del self.ip_activities[ip]
+            self.aggregated_attackers.pop(ip, None)
+            self.multi_step_attacks.pop(ip, None)
+            for attackers in self.threshold_attackers.values():
+                attackers.discard(ip)
+            for peaks in self.threshold_peaks.values():
+                peaks.pop(ip, None)
+            self.touched_ips.discard(ip)
+
+    def drain_changes(self):
+        """Refreshes the IPs that received events and returns those whose state changed meaningfully
+
+        An IP is returned when its set of attack categories, reached thresholds or detected sequence changed,
+        or when the number of its kept logs doubled since it was last summarized.
+        """
+        self.evict_idle_ips()
+        changed = []
+
+        for ip in sorted(self.touched_ips):
+            state = self.ip_states[ip]
+            reached = frozenset(self.reached_thresholds(ip, state))
+
+            logs = state.logs  # Maintained by add_row, the summarizer reads it between rows
+            sequence = None
+            if state.sequence and state.sequence[1] >= state.last_seen - self.window_seconds:
+                sequence = state.sequence[0]  # Completed inside the time window
+
+            # Keep the batch-mode attributes in sync so the runners can read them the same way
+            for name, attackers in self.threshold_attackers.items():
+                self._update_flag(attackers, ip, name in reached)
+            if sequence:
+                self.multi_step_attacks[ip] = sequence
+            else:
+                self.multi_step_attacks.pop(ip, None)
+            if logs:
+                self.aggregated_attackers[ip] = logs
+            else:
+                self.aggregated_attackers.pop(ip, None)
+                continue
+
+            signature = (frozenset(state.categories), reached, sequence, len(logs).bit_length())
+            if signature != state.summarized_signature:
+                state.summarized_signature = signature
+                changed.append(ip)
+
+        self.touched_ips.clear()
+        return changed
+
+    def reached_thresholds(self, ip, state):
+        """Returns the names of the thresholds the IP reached, recording the peak window of windowed ones"""
+        reached = []
+        for threshold in self.rules.thresholds:
+            if threshold.window_seconds is None:
+                if state.categories[threshold.category] >= threshold.min_count:
+                    reached.append(threshold.name)
+                continue
+
+            counter = state.rate_counters.get(threshold.name)
+            if counter and counter.peak >= threshold.min_count:
+                reached.append(threshold.name)
+                self.threshold_peaks[threshold.name][ip] = (counter.peak, counter.peak_start, counter.peak_end)
+            else:
+                self.threshold_peaks[threshold.name].pop(ip, None)
+        return reached
+
+    @staticmethod
+    def _update_flag(attackers, ip, flagged):
+        """Adds or removes the IP from a set of flagged attackers"""
+        if flagged:
+            attackers.add(ip)
+        else:
+            attackers.discard(ip)
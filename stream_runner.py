@@ -0,0 +1,79 @@
+import csv
+import queue
+import sys
+import threading
+import time
+
+from json_runner import print_attack_summary, report_cache_stats, report_token_savings
+from profiler import Profiler
+from rule_engine import RuleSet
+from stream_filter import StreamingFilter  # Import the StreamingFilter class
+from summarizer import build_summarizer
+
+
+def follow_lines(file_path, on_idle, poll_interval=1.0):
+    """Yields the lines of a growing file like `tail -f`, or of stdin when file_path is '-'
+
+    on_idle is called whenever no new data is available, so pending work can be flushed while waiting.
+    """
+    if file_path == "-":
+        # Reads on stdin block, so a thread reads it and a quiet pipe is noticed by waiting on the queue
+        lines = queue.Queue()
+
+        def read_stdin():
+            for line in sys.stdin:
+                lines.put(line)
+            lines.put(None)  # The producer closed stdin
+
+        threading.Thread(target=read_stdin, daemon=True).start()
+        while True:
+            try:
+                line = lines.get(timeout=poll_interval)
+            except queue.Empty:
+                on_idle()
+                continue
+            if line is None:
+                return
+            yield line
+
+    with open(file_path, 'r', encoding='utf-8', newline='') as file:
+        partial = ""  # A line the writer has not finished yet
+        while True:
+            line = file.readline()
+            if not line:
+                on_idle()
+                time.sleep(poll_interval)
+                continue
+
+            partial += line
+            if partial.endswith("\n"):
+                yield partial
+                partial = ""
+
+
+def stream_runner(api_key, file_path, window_seconds=3600, idle_seconds=3600, flush_seconds=10, rules_path=None, profiler=None, **llm_kwargs):
+    """Follows an appending WAF log and re-summarizes attackers whose activity changed"""
+    profiler = profiler or Profiler()  # Stage timings, read by --profile
+    stream = StreamingFilter(window_seconds, idle_seconds, rules=RuleSet.load(rules_path))
+    summarizer = build_summarizer(api_key, profiler=profiler, **llm_kwargs)
+    last_flush = time.monotonic()
+
+    def flush():
+        nonlocal last_flush
+        last_flush = time.monotonic()
+        with profiler.stage("summarize", "IPs") as stage:
+            for ip, attack_summary_json in summarizer.summarize(stream, stream.drain_changes()):
+                print_attack_summary(attack_summary_json)
+                stage.items += 1
+
+    reader = csv.DictReader(follow_lines(file_path, on_idle=flush))
+    for row in reader:
+        stream.add_row(row)
+        profiler.count("rows_read")
+        if time.monotonic() - last_flush >= flush_seconds:
+            flush()
+
+    flush()  # Summarize what is left once stdin is closed
+    stream.report_skipped_rows()
+    report_token_savings(summarizer.llm.token_savings)
+    report_cache_stats(summarizer.close())
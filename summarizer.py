@@ -0,0 +1,152 @@
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from llm_processor import LLMProcessor
+from log_compactor import LogCompactor
+from retry import RetryPolicy
+from summary_cache import SummaryCache
+
+
+def build_summarizer(api_key, concurrency=4, requests_per_minute=None, tokens_per_minute=None, api_url=None, max_attempts=5,
+                     cache_path=None, cache_ttl_hours=168, token_budget=3000, batch_size=1, batch_token_budget=6000, profiler=None):
+    """Creates the LLMProcessor and ConcurrentSummarizer shared by all runners from the command line options"""
+    cache = SummaryCache(cache_path, cache_ttl_hours * 3600) if cache_path else None
+    llm = LLMProcessor(api_key, api_url, RetryPolicy(max_attempts), cache=cache, compactor=LogCompactor(token_budget), profiler=profiler)
+    return ConcurrentSummarizer(llm, concurrency, requests_per_minute, tokens_per_minute, batch_size, batch_token_budget)
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute):
+        """Initialize a bucket that refills rate_per_minute units per minute, up to one minute of quota"""
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute  # Start full, the provider quota is per rolling minute
+        self.rate = rate_per_minute / 60  # Units refilled per second
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        """Blocks until amount units are available and takes them"""
+        amount = min(amount, self.capacity)  # A single oversized request waits for a full bucket
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        """Initialize the limiter with the provider's RPM and TPM quotas (None means unlimited)"""
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def acquire(self, tokens):
+        """Blocks until one request with the given number of tokens fits into the quotas"""
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens:
+            self.tokens.acquire(tokens)
+
+
+class ConcurrentSummarizer:
+    def __init__(self, llm, concurrency=4, requests_per_minute=None, tokens_per_minute=None, batch_size=1, batch_token_budget=6000, batch_max_logs=500):
+        """Initialize the summarizer with an LLMProcessor, a worker limit, the provider quotas and the batching limits"""
+        self.llm = llm
+        self.concurrency = concurrency  # Maximum number of requests in flight
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.batch_size = batch_size  # Maximum number of low-volume IPs sent in one request, 1 disables batching
+        self.batch_token_budget = batch_token_budget  # Maximum estimated tokens of the attacker sections of one batch
+        self.batch_max_logs = batch_max_logs  # IPs with more filtered logs are never batched, so they aren't compacted to find out
+
+    def summarize(self, filter_obj, ips=None, ordered=False):
+        """Summarizes the aggregated attackers of a Filter and yields (ip, summary) pairs
+
+        Results are yielded as they complete, or in the order of the IPs when ordered is True.
+        """
+        if ips is None:
+            ips = list(filter_obj.aggregated_attackers)
+
+        sections = {}  # Attacker sections compacted while planning, reused by the batch prompts
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                futures = {executor.submit(self.summarize_batch, filter_obj, batch, sections): batch for batch in self.plan_batches(filter_obj, ips, sections)}
+                if not ordered:
+                    for future in as_completed(futures):
+                        yield from future.result().items()
+                    return
+
+                future_of_ip = {ip: future for future, batch in futures.items() for ip in batch}
+                for ip in ips:
+                    yield ip, future_of_ip[ip].result()[ip]
+            except BaseException:
+                executor.shutdown(cancel_futures=True)  # e.g. a rejected API key, the queued IPs would fail the same way
+                raise
+
+    def plan_batches(self, filter_obj, ips, sections=None):
+        """Yields the IPs grouped into requests: low-volume IPs are packed together under the batch token budget, the rest go alone
+
+        Batches are yielded as soon as they are planned, so requests start while the remaining IPs are sized.
+        sections receives the compacted attacker section of every batched IP, for the batch prompt to reuse.
+        """
+        if self.batch_size <= 1:
+            yield from ([ip] for ip in ips)
+            return
+
+        sections = {} if sections is None else sections
+        small_share = self.batch_token_budget // 4  # An IP is low-volume when its section uses at most a quarter of a batch
+        batch, batch_tokens = [], 0
+        for ip in ips:
+            if len(filter_obj.aggregated_attackers[ip]) > self.batch_max_logs:
+                yield [ip]  # Too many logs to be low-volume, not worth compacting before its own prompt does
+                continue
+            section = self.llm.attacker_section(ip, *self.attacker_details(filter_obj, ip))
+            tokens = self.llm.estimate_tokens(section)
+            if tokens > small_share:
+                yield [ip]
+                continue
+            if batch and (len(batch) == self.batch_size or batch_tokens + tokens > self.batch_token_budget):
+                yield batch
+                batch, batch_tokens = [], 0
+            sections[ip] = section
+            batch.append(ip)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def summarize_batch(self, filter_obj, batch, sections=None):
+        """Summarizes one planned request and returns {ip: summary}"""
+        if len(batch) == 1:
+            return dict([self.summarize_ip(filter_obj, batch[0])])
+        attackers = {ip: self.attacker_details(filter_obj, ip) for ip in batch}
+        batch_sections = {ip: sections.pop(ip) for ip in batch if ip in sections} if sections else None  # Freed once sent
+        return self.llm.attack_summaries_with_retry(attackers, self.rate_limiter, batch_sections)
+
+    @staticmethod
+    def attacker_details(filter_obj, ip):
+        """Returns (logs, sequence, JWT status, Access Control status) of one attacker, as the LLM prompts take them"""
+        return (
+            filter_obj.aggregated_attackers[ip],
+            filter_obj.multi_step_attacks.get(ip, "None"),  # Retrieves the detected multistep attack sequence for the IP
+            filter_obj.threshold_status(ip, "jwt_brute_force"),  # False, or True with the peak window
+            filter_obj.threshold_status(ip, "access_control_brute_force"),
+        )
+
+    def close(self):
+        """Releases the summary cache and returns its statistics, or None without a cache"""
+        if not self.llm.cache:
+            return None
+        stats = self.llm.cache.stats()
+        self.llm.cache.close()
+        return stats
+
+    def summarize_ip(self, filter_obj, ip):
+        """Summarizes the logs of one attacker and returns (ip, summary)"""
+        attack_summary_json = self.llm.attack_summary_with_retry(ip, *self.attacker_details(filter_obj, ip), self.rate_limiter)
+        return ip, attack_summary_json
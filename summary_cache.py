@@ -0,0 +1,82 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class SummaryCache:
+    def __init__(self, path, ttl_seconds=7 * 24 * 3600, max_entries=100000):
+        """Initialize an SQLite cache of attack summaries with TTL and size-based eviction"""
+        self.ttl_seconds = ttl_seconds  # Entries older than this are treated as missing
+        self.max_entries = max_entries  # Least recently used entries are evicted beyond this size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()  # The connection is shared by all summarization workers
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS summaries_last_access ON summaries (last_access)")
+        self.connection.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(model, prompt_version, attacker_ip, attacker_logs, detected_sequence_status, jwt_brute_force_status, access_control_brute_force_status):
+        """Hashes everything that determines the LLM answer into a cache key
+
+        Logs are normalized to the fields sent in the prompt and sorted, so row order and extra CSV columns don't matter.
+        """
+        normalized_logs = sorted(
+            (log["description"], log["receivedTimeFormatted"], log["violationType"], log.get("uri", "N/A"))
+            for log in attacker_logs
+        )
+        payload = [model, prompt_version, attacker_ip, normalized_logs, detected_sequence_status, jwt_brute_force_status, access_control_brute_force_status]
+        return hashlib.sha256(json.dumps(payload, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the cached summary for the key, or None"""
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute("SELECT value, created FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE summaries SET last_access = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+            self.hits += 1
+        return json.loads(row[0])  # A fresh object, callers may modify it
+
+    def put(self, key, summary):
+        """Stores a summary under the key"""
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO summaries (key, value, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(summary), now, now)
+            )
+            self.connection.commit()
+
+    def evict(self):
+        """Removes expired entries and the least recently used ones beyond max_entries"""
+        with self.lock:
+            expired = self.connection.execute("DELETE FROM summaries WHERE created < ?", (time.time() - self.ttl_seconds,)).rowcount
+            oversized = self.connection.execute(
+                "DELETE FROM summaries WHERE key IN (SELECT key FROM summaries ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            self.connection.commit()
+            self.evictions += expired + oversized
+
+    def stats(self):
+        """Returns the hit, miss and eviction counters"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def close(self):
+        """Evicts old entries and closes the database"""
+        self.evict()
+        self.connection.close()
@@ -0,0 +1,105 @@
+"""The python and pandas Filter backends must give identical results on every kind of log"""
+import csv
+
+import pytest
+
+from benchmarks.synthetic import FIELDNAMES, generate_rows
+from event_store import EventRecord
+from filter import create_filter
+
+RESULT_ATTRIBUTES = ("skipped_rows", "ip_activities", "filtered", "jwt_brute_force_attackers", "access_control_brute_force_attackers",
+                     "threshold_peaks", "aggregated_attackers", "multi_step_attacks")
+
+
+def empty_uri(number, row):
+    """Leaves the uri of every third row empty"""
+    if number % 3 == 0:
+        row["uri"] = ""
+    return row
+
+
+def multiline_description(number, row):
+    """Gives every seventh row a quoted description spanning several lines"""
+    if number % 7 == 0:
+        row["description"] = f'{row["violationType"]} detected:\n  payload "{row["uri"]}?id=1, 2"\n  blocked'
+    return row
+
+
+def timestamp_seconds(number, row):
+    """Adds seconds to every timestamp"""
+    row["receivedTimeFormatted"] = f'{row["receivedTimeFormatted"]}:{number * 7 % 60:02d}'
+    return row
+
+
+def bad_timestamp(number, row):
+    """Leaves the timestamp of some rows empty or unparsable"""
+    if number % 11 == 0:
+        row["receivedTimeFormatted"] = "" if number % 2 else "not a time"
+    return row
+
+
+# (rows, generate_rows arguments, per-row rewrite) of the synthetic logs the backends are compared on
+PARITY_CASES = {
+    "tiny": (50, {"ips": 5}, None),
+    "empty": (0, {}, None),
+    "many small IPs": (20_000, {"ips": 5_000, "noisy_ip_share": 0.0}, None),
+    "dominant scanner": (20_000, {"ips": 20, "noisy_ip_share": 0.6}, None),
+    "attack sequences": (5_000, {"ips": 200, "sequence_share": 0.3}, None),
+    "empty uri": (3_000, {"ips": 50}, empty_uri),
+    "multi-line quoted fields": (3_000, {"ips": 50}, multiline_description),
+    "timestamps with seconds": (3_000, {"ips": 50}, timestamp_seconds),
+    "bad timestamps": (3_000, {"ips": 50}, bad_timestamp),
+}
+
+
+def write_case(path, rows, kwargs, rewrite):
+    """Writes one synthetic log of PARITY_CASES to path and returns the path"""
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for number, row in enumerate(generate_rows(rows, **kwargs)):
+            writer.writerow(rewrite(number, row) if rewrite else row)
+    return str(path)
+
+
+def plain(value):
+    """Returns a result attribute with EventRecords replaced by dicts, so results compare by value"""
+    if isinstance(value, EventRecord):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    return value
+
+
+def run_pipeline(file_path, backend, workers=1):
+    """Runs the full filter pipeline and returns the filter object"""
+    filter_obj = create_filter(file_path, backend, workers)
+    filter_obj.create_ip_activities()
+    filter_obj.filter_logs()
+    filter_obj.aggregate_by_ip()
+    filter_obj.detect_attack_sequences()
+    return filter_obj
+
+
+@pytest.mark.parametrize("case", PARITY_CASES)
+def test_pandas_matches_python(tmp_path, case):
+    file_path = write_case(tmp_path / "log.csv", *PARITY_CASES[case])
+    python_filter = run_pipeline(file_path, "python")
+    pandas_filter = run_pipeline(file_path, "pandas")
+    for attribute in RESULT_ATTRIBUTES:
+        assert plain(getattr(python_filter, attribute)) == plain(getattr(pandas_filter, attribute)), attribute
+    assert list(python_filter.aggregated_attackers) == list(pandas_filter.aggregated_attackers)
+
+
+@pytest.mark.parametrize("workers", [4, 7, 13])
+@pytest.mark.parametrize("case", PARITY_CASES)
+def test_sharded_matches_python(tmp_path, case, workers):
+    """Byte-range shards must not cut records, whatever the number of workers"""
+    file_path = write_case(tmp_path / "log.csv", *PARITY_CASES[case])
+    python_filter = run_pipeline(file_path, "python")
+    sharded_filter = run_pipeline(file_path, "python", workers)
+    for attribute in RESULT_ATTRIBUTES:
+        assert plain(getattr(python_filter, attribute)) == plain(getattr(sharded_filter, attribute)), attribute
+    assert list(python_filter.aggregated_attackers) == list(sharded_filter.aggregated_attackers)
@@ -0,0 +1,60 @@
+"""JSONLWriter must resume cleanly from the output of a run that was killed mid-write"""
+import gzip
+import io
+import json
+import sys
+
+import pytest
+
+from jsonl_writer import JSONLWriter
+
+
+def write_records(path, ips, resume=False):
+    """Writes one record per IP and returns the IPs an earlier run had already written"""
+    with JSONLWriter(path, resume=resume) as writer:
+        for ip in ips:
+            if ip not in writer.written_ips:
+                writer.write({"attacker_ip": ip, "summary": "x" * 200})
+    return writer.written_ips
+
+
+def read_ips(path):
+    """Returns the IPs in a finished output, failing on any invalid line"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as file:
+        return [json.loads(line)["attacker_ip"] for line in file]
+
+
+@pytest.mark.parametrize("name", ["out.jsonl", "out.jsonl.gz"])
+def test_half_written_last_line(tmp_path, name):
+    path = str(tmp_path / name)
+    write_records(path, ["1.1.1.1", "2.2.2.2"])
+    opener = gzip.open if name.endswith(".gz") else open
+    with opener(path, "ab") as file:
+        file.write(b'{"attacker_ip": "3.3.3.3", "summ')  # Killed in the middle of the third record
+
+    assert write_records(path, ["1.1.1.1", "2.2.2.2", "3.3.3.3"], resume=True) == {"1.1.1.1", "2.2.2.2"}
+    assert read_ips(path) == ["1.1.1.1", "2.2.2.2", "3.3.3.3"]
+
+
+@pytest.mark.parametrize("cut", [4, 20, 200])
+def test_truncated_gzip(tmp_path, cut):
+    path = str(tmp_path / "out.jsonl.gz")
+    ips = [f"10.0.0.{number}" for number in range(50)]
+    write_records(path, ips)
+    with open(path, "rb") as file:
+        data = file.read()
+    with open(path, "wb") as file:
+        file.write(data[:-cut])  # Trailer and maybe the last blocks missing
+
+    recovered = write_records(path, ips, resume=True)
+    assert recovered <= set(ips)
+    assert sorted(read_ips(path)) == sorted(ips)  # Every IP exactly once, the file is valid gzip again
+
+
+def test_compressed_stdout(monkeypatch):
+    stdout = io.BytesIO()
+    monkeypatch.setattr(sys, "stdout", io.TextIOWrapper(stdout))
+    with JSONLWriter("-", "gzip") as writer:
+        writer.write({"attacker_ip": "1.1.1.1"})
+    assert json.loads(gzip.decompress(stdout.getvalue())) == {"attacker_ip": "1.1.1.1"}
@@ -0,0 +1,114 @@
+"""StreamingFilter must keep the same logs as the batch Filter, and forget what leaves its time window"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.synthetic import FIELDNAMES, generate_rows, write_csv
+from filter import create_filter
+from stream_filter import StreamingFilter
+
+UNBOUNDED = 10 ** 9  # Window, idle time and cap that never drop anything from a test log
+
+
+def log_key(log):
+    """Returns the CSV fields of a kept log, so dict rows and EventRecords compare by value"""
+    return tuple(log[field] for field in FIELDNAMES)
+
+
+def row_at(ip, category, minutes, uri="/search"):
+    """Returns one log row of the IP, minutes after the start of 2025"""
+    return {
+        "externalIp": ip,
+        "violationCategory": category,
+        "violationType": category,
+        "uri": uri,
+        "description": f"{category} detected on {uri}",
+        "receivedTimeFormatted": (datetime(2025, 1, 1) + timedelta(minutes=minutes)).strftime("%d/%m/%Y %H:%M"),
+    }
+
+
+@pytest.mark.parametrize("kwargs", [{"ips": 20}, {"ips": 300, "sequence_share": 0.3}, {"ips": 50, "noisy_ip_share": 0.6}])
+def test_unbounded_window_matches_batch_filter(tmp_path, kwargs):
+    rows = 4_000
+    batch = create_filter(write_csv(str(tmp_path / "log.csv"), rows, **kwargs))
+    batch.create_ip_activities()
+    batch.filter_logs()
+    batch.aggregate_by_ip()
+    batch.detect_attack_sequences()
+
+    stream = StreamingFilter(UNBOUNDED, UNBOUNDED, UNBOUNDED)
+    for number, row in enumerate(generate_rows(rows, **kwargs)):
+        stream.add_row(row)
+        if number % 500 == 0:
+            stream.drain_changes()  # Draining midway must not change the outcome
+    stream.drain_changes()
+
+    assert {ip: [log_key(log) for log in logs] for ip, logs in stream.aggregated_attackers.items()} == \
+           {ip: [log_key(log) for log in logs] for ip, logs in batch.aggregated_attackers.items()}
+    assert stream.multi_step_attacks == batch.multi_step_attacks
+    assert stream.threshold_attackers == batch.threshold_attackers
+    assert stream.threshold_peaks == batch.threshold_peaks
+
+
+def test_new_category_keeps_earlier_rows():
+    """JWT failures alone are low priority, a second attack category makes the IP's earlier rows worth keeping"""
+    stream = StreamingFilter(UNBOUNDED, UNBOUNDED, UNBOUNDED)
+    for minute in range(3):
+        stream.add_row(row_at("10.0.0.1", "JWT Validation Failed", minute))
+    assert stream.drain_changes() == []
+    assert "10.0.0.1" not in stream.aggregated_attackers
+
+    stream.add_row(row_at("10.0.0.1", "Injections", 3))
+    assert stream.drain_changes() == ["10.0.0.1"]
+    categories = [log["violationCategory"] for log in stream.aggregated_attackers["10.0.0.1"]]
+    assert categories == ["JWT Validation Failed"] * 3 + ["Injections"] * 2  # Both keep rules match the injection
+
+
+def test_window_trimming():
+    """Events older than the window are dropped, and the IP falls back to a single category band"""
+    stream = StreamingFilter(window_seconds=600, idle_seconds=UNBOUNDED, max_events_per_ip=UNBOUNDED)
+    stream.add_row(row_at("10.0.0.1", "JWT Validation Failed", 0))
+    stream.add_row(row_at("10.0.0.1", "Injections", 5))
+    stream.drain_changes()
+    assert len(stream.aggregated_attackers["10.0.0.1"]) == 3
+
+    stream.add_row(row_at("10.0.0.1", "Injections", 12))  # More than 10 minutes after the JWT failure
+    stream.drain_changes()
+    state = stream.ip_states["10.0.0.1"]
+    assert [row["receivedTimeFormatted"] for _, row, _ in state.events] == ["01/01/2025 00:05", "01/01/2025 00:12"]
+    assert dict(state.categories) == {"Injections": 2}
+    assert [log["violationCategory"] for log in stream.aggregated_attackers["10.0.0.1"]] == ["Injections"] * 2
+
+
+def test_event_cap():
+    stream = StreamingFilter(UNBOUNDED, UNBOUNDED, max_events_per_ip=5)
+    for minute in range(12):
+        stream.add_row(row_at("10.0.0.1", "Injections", minute))
+    stream.drain_changes()
+    assert len(stream.ip_states["10.0.0.1"].events) == 5
+    assert len(stream.aggregated_attackers["10.0.0.1"]) == 5
+
+
+def test_idle_ips_are_evicted():
+    stream = StreamingFilter(window_seconds=600, idle_seconds=3600)
+    for minute in range(10):
+        stream.add_row(row_at("10.0.0.1", "Access Control", minute, "/admin/"))
+    stream.drain_changes()
+    assert "10.0.0.1" in stream.threshold_attackers["access_control_brute_force"]
+
+    stream.add_row(row_at("10.0.0.2", "Injections", 120))  # Two hours later, 10.0.0.1 has been idle too long
+    assert stream.drain_changes() == ["10.0.0.2"]
+    assert list(stream.ip_states) == ["10.0.0.2"]
+    assert list(stream.ip_activities) == ["10.0.0.2"]
+    assert list(stream.aggregated_attackers) == ["10.0.0.2"]
+    assert "10.0.0.1" not in stream.threshold_attackers["access_control_brute_force"]
+    assert "10.0.0.1" not in stream.threshold_peaks["access_control_brute_force"]
+
+
+def test_bad_timestamps_are_skipped():
+    stream = StreamingFilter()
+    stream.add_row(row_at("10.0.0.1", "Injections", 0))
+    stream.add_row(dict(row_at("10.0.0.1", "Injections", 1), receivedTimeFormatted="not a time"))
+    stream.drain_changes()
+    assert stream.skipped_rows == 1
+    assert len(stream.aggregated_attackers["10.0.0.1"]) == 1
@@ -0,0 +1,131 @@
+"""ConcurrentSummarizer and LLMProcessor against the mock LLM server: ordering, retries, fallbacks and batching"""
+import time
+
+import pytest
+
+from benchmarks.mock_llm import MockLLMServer
+from benchmarks.synthetic import write_csv
+from filter import create_filter
+from llm_processor import LLMProcessor
+from profiler import Profiler
+from retry import CircuitBreaker, RetryPolicy
+from summarizer import ConcurrentSummarizer
+
+
+@pytest.fixture(scope="module")
+def filter_obj(tmp_path_factory):
+    """A filtered synthetic log with a few dozen aggregated attackers"""
+    file_path = str(tmp_path_factory.mktemp("logs") / "log.csv")
+    write_csv(file_path, 3_000, ips=60)
+    filter_obj = create_filter(file_path)
+    filter_obj.create_ip_activities()
+    filter_obj.filter_logs()
+    filter_obj.aggregate_by_ip()
+    filter_obj.detect_attack_sequences()
+    assert len(filter_obj.aggregated_attackers) >= 10
+    return filter_obj
+
+
+def make_summarizer(server, max_attempts=5, concurrency=4, batch_size=1):
+    """Returns a summarizer for the mock server with short backoffs and breaker pauses, and its profiler"""
+    profiler = Profiler()
+    llm = LLMProcessor("test-key", server.url, RetryPolicy(max_attempts, base_delay=0.01, max_delay=0.05),
+                       CircuitBreaker(cooldown=0.05), profiler=profiler)
+    return ConcurrentSummarizer(llm, concurrency, batch_size=batch_size), profiler
+
+
+def assert_llm_summaries(summaries, ips):
+    """Every IP got exactly one summary, written by the LLM for that IP"""
+    assert sorted(ip for ip, _ in summaries) == sorted(ips)
+    for ip, summary in summaries:
+        assert summary["attacker_ip"] == ip
+        assert summary.get("summary_source") != "rule-based"
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_order(filter_obj, monkeypatch, ordered):
+    """Unordered results come as they complete, ordered ones in the order of the IPs whatever completes first"""
+    ips = list(filter_obj.aggregated_attackers)[:8]
+    with MockLLMServer() as server:
+        summarizer, _ = make_summarizer(server)
+        summarize_ip = summarizer.summarize_ip
+
+        def slow_first_ip(filter_obj, ip):
+            if ip == ips[0]:
+                time.sleep(0.5)
+            return summarize_ip(filter_obj, ip)
+
+        monkeypatch.setattr(summarizer, "summarize_ip", slow_first_ip)
+        summaries = list(summarizer.summarize(filter_obj, ips, ordered))
+
+    assert_llm_summaries(summaries, ips)
+    if ordered:
+        assert [ip for ip, _ in summaries] == ips
+    else:
+        assert summaries[-1][0] == ips[0]
+
+
+def test_rate_limited_requests_wait_for_retry_after(filter_obj):
+    ips = list(filter_obj.aggregated_attackers)[:4]
+    with MockLLMServer(rate_limit_rate=0.5, retry_after=1, seed=1) as server:
+        summarizer, profiler = make_summarizer(server, concurrency=1)
+        start = time.monotonic()
+        summaries = list(summarizer.summarize(filter_obj, ips))
+        elapsed = time.monotonic() - start
+
+    assert_llm_summaries(summaries, ips)
+    rate_limited = profiler.counters.get("llm_rate_limited", 0)
+    assert rate_limited > 0
+    assert server.requests == len(ips) + rate_limited
+    assert elapsed >= rate_limited * 1.0  # One worker, so every 429 held it back for the full Retry-After
+
+
+def test_malformed_answers_fall_back_to_rule_based_summary(filter_obj):
+    ips = list(filter_obj.aggregated_attackers)[:5]
+    with MockLLMServer(malformed_rate=1.0) as server:
+        summarizer, profiler = make_summarizer(server)
+        summaries = list(summarizer.summarize(filter_obj, ips))
+
+    assert sorted(ip for ip, _ in summaries) == sorted(ips)
+    assert all(summary["summary_source"] == "rule-based" for _, summary in summaries)
+    retry_policy = summarizer.llm.retry_policy
+    assert server.requests == len(ips) * retry_policy.max_malformed_attempts  # Malformed answers stop before max_attempts
+    assert profiler.counters["llm_malformed_answers"] == server.requests
+    assert profiler.counters["llm_fallbacks"] == len(ips)
+
+
+def test_malformed_answers_are_retried(filter_obj):
+    ips = list(filter_obj.aggregated_attackers)[:10]
+    with MockLLMServer(malformed_rate=0.3, seed=2) as server:
+        summarizer, profiler = make_summarizer(server)
+        summaries = list(summarizer.summarize(filter_obj, ips))
+
+    assert profiler.counters.get("llm_malformed_answers", 0) > 0
+    fallbacks = profiler.counters.get("llm_fallbacks", 0)
+    assert sum(summary.get("summary_source") == "rule-based" for _, summary in summaries) == fallbacks
+    assert fallbacks < profiler.counters["llm_malformed_answers"]  # Most malformed answers were fixed by asking again
+
+
+def test_server_errors_fall_back_after_max_attempts(filter_obj):
+    ips = list(filter_obj.aggregated_attackers)[:3]
+    with MockLLMServer(error_rate=1.0) as server:
+        summarizer, profiler = make_summarizer(server, max_attempts=3)
+        summaries = list(summarizer.summarize(filter_obj, ips))
+
+    assert all(summary["summary_source"] == "rule-based" for _, summary in summaries)
+    assert server.requests == len(ips) * 3
+    assert profiler.counters["llm_retries"] == len(ips) * 2
+
+
+def test_missing_batch_entries_are_retried_per_ip(filter_obj):
+    ips = list(filter_obj.aggregated_attackers)
+    with MockLLMServer(missing_rate=0.3, seed=3) as server:
+        summarizer, profiler = make_summarizer(server, batch_size=8)
+        batches = list(summarizer.plan_batches(filter_obj, ips))
+        summaries = list(summarizer.summarize(filter_obj, ips))
+
+    assert any(len(batch) > 1 for batch in batches)
+    assert_llm_summaries(summaries, ips)
+    retried = profiler.counters["llm_batch_entries_retried"]
+    assert retried > 0
+    assert server.requests == len(batches) + retried  # One request per batch, plus one per IP left out of its answer
@@ -0,0 +1,29 @@
+from datetime import date, datetime, timezone
+from functools import lru_cache
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+FALLBACK_FORMATS = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S")
+
+
+@lru_cache(maxsize=65536)
+def parse_timestamp(value):
+    """Converts a receivedTimeFormatted value (dd/mm/YYYY HH:MM, treated as UTC) to epoch seconds
+
+    Exports have minute resolution, so the same strings repeat a lot and the cache absorbs most calls.
+    """
+    # Fast path for the known layout, e.g. "31/01/2025 14:05"
+    if len(value) == 16 and value[2] == "/" and value[5] == "/" and value[10] == " " and value[13] == ":":
+        days = date(int(value[6:10]), int(value[3:5]), int(value[0:2])).toordinal() - EPOCH_ORDINAL
+        return days * 86400 + int(value[11:13]) * 3600 + int(value[14:16]) * 60
+
+    for time_format in FALLBACK_FORMATS:
+        try:
+            return int(datetime.strptime(value.strip(), time_format).replace(tzinfo=timezone.utc).timestamp())
+        except ValueError:
+            continue
+    raise ValueError(f"Unsupported timestamp: {value!r}")
+
+
+def format_timestamp(epoch):
+    """Formats epoch seconds back to the receivedTimeFormatted layout"""
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%d/%m/%Y %H:%M")
@@ -1,138 +1,152 @@
 import os
+import time
+from datetime import datetime, timedelta, timezone
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import altair as alt
 
-from datetime import datetime
-from filter import Filter
-from llm_processor import LLMProcessor
+from result_store import ResultStore
+from rollups import RESOLUTIONS, pick_resolution
+
+PAGE_SIZE = 50  # Attackers per table page
+REFRESH_SECONDS = 2  # How often partial results are refreshed while the analysis runs
+MAX_CHART_BUCKETS = 10000  # Finer resolutions over a long time range fall back to a coarser one
 
 # ------------------------ Streamlit Title ------------------------
 st.title("🔍 Attacker Analysis Dashboard")
 
 # ------------------------ Environment Variable Checks ------------------------
-api_key = os.getenv("API_KEY")
-if not api_key:
-    st.error("API Key is missing! Make sure to provide --api_key when running the script.")
+# The analysis runs outside of Streamlit (proj.py) and writes to the result store, the dashboard only reads it
+store_path = os.getenv("RESULT_STORE")
+if not store_path:
+    st.error("Result store is missing! Start the dashboard with: python proj.py --output UI ...")
     st.stop()
 
-# Retrieve file path from environment variable
-file_path = os.getenv("FILE_PATH")
-if not file_path:
-    st.error("File path is missing! Make sure to provide --file_path when running the script.")
-    st.stop()
+source = os.getenv("RESULT_SOURCE")  # The analyzed log and rule files, the newest run of any input when not set
 
-# ------------------------ Session State Initialization ------------------------
-if "attack_summaries" not in st.session_state:
-    st.session_state.attack_summaries = {}
-
-# Show loading animation while data is being processed
-with st.spinner("Processing logs and generating attack summaries..."):
-    # Only run filtering and LLM analysis if not done it before
-    if not st.session_state.attack_summaries:
-        # Initialize classes
-        filter_obj = Filter(file_path)
-        llm = LLMProcessor(api_key)
-
-        if "filtered_logs" not in st.session_state:
-            filter_obj = Filter(file_path)
-            filter_obj.create_ip_activities()
-            filter_obj.filter_logs()
-            filter_obj.aggregate_by_ip()
-            filter_obj.detect_attack_sequences()
-
-            # Store filtered logs in session state to avoid recomputation
-            st.session_state.filtered_logs = filter_obj.filtered
-
-        # Generate attack summaries using LLM
-        attack_summaries = {}
-        for ip, logs in filter_obj.aggregated_attackers.items():
-            detected_sequence_status = filter_obj.multi_step_attacks.get(ip, "None")
-            jwt_brute_force_status = ip in filter_obj.jwt_brute_force_attackers
-            access_control_brute_force_status = ip in filter_obj.access_control_brute_force_attackers
-
-            success = False   # Make sure we got a response for the IP
-
-            while not success:
-                attack_summary_json = llm.attack_summary(
-                    ip,
-                    logs,
-                    detected_sequence_status,
-                    jwt_brute_force_status,
-                    access_control_brute_force_status
-                )
-                if attack_summary_json:
-                    attack_summaries[ip] = {"attacker_ip": ip, **attack_summary_json}
-                    success = True
-
-            # Save results in session state
-            st.session_state.attack_summaries = attack_summaries
 
-# ------------------------ Attack Summary Table ------------------------
-df = pd.DataFrame.from_dict(st.session_state.attack_summaries, orient="index")
-# If 'attacker_ip' exists as a column and as the index, drop the column version
-if "attacker_ip" in df.columns:
-    df = df.drop(columns=["attacker_ip"])
+# ------------------------ Cached Store Access ------------------------
+@st.cache_resource
+def open_store(path):
+    """One connection to the result store, shared by every session and tab"""
+    return ResultStore(path)
 
-# Ensure attacker_ip is set as the index for better presentation
-df.index.name = "attacker_ip"
 
-# ------------------------ IP Filter ------------------------
+@st.cache_data(show_spinner=False)
+def count_matches(path, run_id, summarized, search):
+    """Returns the number of stored attackers whose IP contains search
 
-# Search Box for Attacker IPs
-search_ip = st.text_input("🔍 Search for Attacker IP:", "")
+    summarized is part of the cache keys, so results are reloaded only when new summaries were stored.
+    """
+    return open_store(path).count_summaries(run_id, search)
 
-# Dynamically filter IPs based on search input
-filtered_ips = [ip for ip in st.session_state.attack_summaries.keys() if search_ip in ip]
 
-# Drop-down menu only showing filtered IPs
-selected_ip = st.selectbox("Filter by Attacker IP:", ["All"] + filtered_ips)
+@st.cache_data(show_spinner=False)
+def load_page(path, run_id, summarized, search, page):
+    """Returns one page of the summaries whose IP contains search"""
+    rows = open_store(path).page(run_id, search, page * PAGE_SIZE, PAGE_SIZE)
+    return pd.DataFrame(rows).set_index("attacker_ip") if rows else pd.DataFrame()
 
-# Display filtered results
-if selected_ip == "All":
-    filtered_df = df[df.index.str.contains(search_ip, na=False)] if search_ip else df
-    st.write(filtered_df)
-else:
-    st.write(df.loc[[selected_ip]])
 
-# ------------------------ Attack Frequency Graph ------------------------
-st.subheader("📈 Attack Frequency Over Time")
+@st.cache_data(show_spinner=False)
+def load_rollup_span(path, run_id):
+    """Returns the first and last minute with events and the violation categories of a run, or None"""
+    return open_store(path).rollup_span(run_id)
 
-# Extract timestamps from filtered logs
-attack_timestamps = [log["receivedTimeFormatted"] for log in st.session_state.filtered_logs]
 
-# Convert timestamps to datetime objects
-attack_timestamps = [
-    ts if isinstance(ts, datetime) else datetime.strptime(ts, "%d/%m/%Y %H:%M")
-    for ts in attack_timestamps
-]
+@st.cache_data(show_spinner=False)
+def load_rollup(path, run_id, resolution, start, end, ips, categories):
+    """Returns the filtered events per time bucket and category, with a zero for every bucket without events
 
-# Create DataFrame for time-based aggregation
-df_time = pd.DataFrame({"timestamp": attack_timestamps})
+    The rollups are written once before summarization starts, so the run id alone keys the cache.
+    """
+    rows = open_store(path).rollup(run_id, resolution, start // resolution * resolution, end, ips, categories)
+    counts = pd.DataFrame(rows, columns=["time_bin", "category", "attack_count"])
+    buckets = range(start // resolution * resolution, end + 1, resolution)
+    counts = counts.pivot(index="time_bin", columns="category", values="attack_count").reindex(buckets, fill_value=0).fillna(0)
+    counts = counts.rename_axis("time_bin").reset_index().melt(id_vars="time_bin", var_name="category", value_name="attack_count")
+    counts["time_bin"] = pd.to_datetime(counts["time_bin"], unit="s")
+    return counts
 
-# Set time interval for binning
-df_time["time_bin"] = df_time["timestamp"].dt.floor("10T")  # 10 minute intervals
 
-# Count number of attacks per time bin
-attack_counts = df_time.groupby("time_bin").size().reset_index(name="attack_count")
+def to_datetime(epoch):
+    """Returns a naive UTC datetime, as the chart shows times"""
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None)
 
-# Plot the attack frequency graph
-fig, ax = plt.subplots(figsize=(10, 5))
-ax.plot(attack_counts["time_bin"], attack_counts["attack_count"], marker="o", linestyle="-", color="b")
 
-# Format X-axis to display only the time (HH:MM)
-ax.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
-ax.xaxis.set_major_locator(mdates.MinuteLocator(interval=30))  # Show every 20 minutes
+store = open_store(store_path)
+run = store.latest_run(source)
+if run is None or run["status"] == "analyzing":
+    st.info("Processing logs... summaries will appear here as they are generated.")
+    time.sleep(REFRESH_SECONDS)
+    st.rerun()
 
-# Labels and title
-ax.set_xlabel("Time")
-ax.set_ylabel("Number of Attacks")
-ax.set_title("Attack Frequency Over Time")
-ax.grid(True)
+# ------------------------ Analysis Progress ------------------------
+if run["status"] == "summarizing":
+    st.progress(run["summarized"] / max(run["total_ips"], 1), text=f"Generating attack summaries: {run['summarized']} of {run['total_ips']} attackers")
+elif run["status"] == "failed":
+    st.warning(f"The analysis stopped early, showing the {run['summarized']} summaries it stored.")
 
-# Rotate x-axis labels for readability
-plt.xticks(rotation=45)
+# ------------------------ Attack Summary Table ------------------------
+# Search Box for Attacker IPs, matched in the store instead of in the browser session
+search_ip = st.text_input("🔍 Search for Attacker IP:", "").strip()
 
-# Display the graph in Streamlit
-st.pyplot(fig)
+matching = count_matches(store_path, run["id"], run["summarized"], search_ip)
+page_count = max(1, -(-matching // PAGE_SIZE))
+page = st.number_input(f"Page (of {page_count}):", min_value=1, max_value=page_count, value=1, step=1) - 1
+df = load_page(store_path, run["id"], run["summarized"], search_ip, page)
+st.caption(f"{matching} attackers match, showing {len(df)}")
+st.dataframe(df)
+
+# Drop-down menu with the IPs of the current page, showing the full stored summary
+selected_ip = st.selectbox("Show the full summary of:", ["None"] + list(df.index))
+if selected_ip != "None":
+    st.json(store.summary(run["id"], selected_ip))
+
+# ------------------------ Attack Frequency Graph ------------------------
+st.subheader("📈 Attack Frequency Over Time")
+
+# Filtered events were rolled up per category and IP at several resolutions by the analysis, so every filter and
+# zoom level below is one indexed query instead of a pass over the logs
+span = load_rollup_span(store_path, run["id"])
+if span is None:
+    st.caption("No filtered events to show.")
+else:
+    first, last, categories = span
+    category_column, ip_column, resolution_column = st.columns([2, 2, 1])
+    selected_categories = category_column.multiselect("Violation categories (all when empty):", categories)
+    selected_ips = ip_column.multiselect("Attackers of the current page (all when empty):", list(df.index))
+    resolution_label = resolution_column.selectbox("Resolution:", ["Auto"] + list(RESOLUTIONS))
+
+    # The time range picks the zoom level; Auto shows it at the finest resolution that keeps the chart fast
+    start, end = first, last
+    if last > first:
+        start, end = st.slider("Time range (UTC):", min_value=to_datetime(first), max_value=to_datetime(last),
+                               value=(to_datetime(first), to_datetime(last)), step=timedelta(minutes=1), format="MM-DD HH:mm")
+        start, end = (int(value.replace(tzinfo=timezone.utc).timestamp()) for value in (start, end))
+    resolution = pick_resolution(start, end) if resolution_label == "Auto" else RESOLUTIONS[resolution_label]
+    if (end - start) / resolution > MAX_CHART_BUCKETS:
+        resolution = pick_resolution(start, end, MAX_CHART_BUCKETS)
+        st.caption("Narrow the time range to see it at a finer resolution.")
+
+    attack_counts = load_rollup(store_path, run["id"], resolution, start, end, tuple(selected_ips), tuple(selected_categories))
+    st.caption(f"Events per {next(label for label, seconds in RESOLUTIONS.items() if seconds == resolution)}, "
+               f"{attack_counts['attack_count'].sum():,.0f} in range")
+
+    # Drag to pan and scroll to zoom within the loaded buckets, click a legend entry to highlight one category
+    zoom = alt.selection_interval(bind="scales", encodings=["x"])
+    highlight = alt.selection_point(fields=["category"], bind="legend")
+    chart = alt.Chart(attack_counts).mark_line().encode(
+        x=alt.X("time_bin:T", title="Time"),
+        y=alt.Y("attack_count:Q", title="Number of Attacks"),
+        color=alt.Color("category:N", title="Violation category"),
+        opacity=alt.condition(highlight, alt.value(1.0), alt.value(0.15)),
+        tooltip=[alt.Tooltip("time_bin:T", title="Time", format="%Y-%m-%d %H:%M"), "category:N", alt.Tooltip("attack_count:Q", title="Attacks")],
+    ).add_params(zoom, highlight).properties(title="Attack Frequency Over Time")
+    st.altair_chart(chart, use_container_width=True)
+
+# ------------------------ Partial Results ------------------------
+# While summaries are still being generated, rerun to show the new ones (cached pages make this cheap)
+if run["status"] == "summarizing":
+    time.sleep(REFRESH_SECONDS)
+    st.rerun()